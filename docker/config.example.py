@@ -5,6 +5,8 @@ CILOGON_LDAP_PASSFILE = "/etc/opt/topology/cilogon-ldap"
 
 TOPOLOGY_DATA_DIR = "/data/app/topology"
 CONTACT_DATA_DIR = "/data/app/contact"
+# Written by the topology-loader process and read by the others (see apache.conf)
+DATA_SNAPSHOT_FILE = "/data/app/topology-data.pickle"
 
 #TOPOLOGY_DATA_REPO = "https://github.com/opensciencegrid/topology"
 #TOPOLOGY_DATA_BRANCH = "itb"
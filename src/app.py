@@ -15,6 +15,7 @@ import traceback
 import urllib.parse
 import requests
 import threading
+from typing import Callable, Dict, List, Optional, Union
 from wtforms import ValidationError
 from flask_wtf.csrf import CSRFProtect
 
@@ -28,9 +29,12 @@ from webapp.common import (
     NamespacesFilters,
     PreJSON,
     cache_control_private,
+    configure_yaml_cache,
     escape,
+    git_resolve_commit,
     is_null,
     is_true,
+    iter_xml_bytes,
     readfile,
     simplify_attr_list,
     support_cors,
@@ -38,10 +42,12 @@ from webapp.common import (
     to_json_bytes,
     to_xml_bytes,
 )
-from webapp.flask_common import create_accepted_response
+from webapp.flask_common import ResponseCache, create_accepted_response
+from webapp.changes import COMMIT_RE, DATASETS as CHANGES_DATASETS, get_cached_changes, get_changes, oldest_commit
 from webapp.exceptions import DataError, ResourceNotRegistered, ResourceMissingServices
 from webapp.forms import GenerateDowntimeForm, GenerateResourceGroupDowntimeForm, GenerateProjectForm
-from webapp.models import GlobalData
+from webapp.models import CachedData, DataSnapshot, GlobalData
+from webapp.topology import Resource
 from webapp.oasis_managers import get_oasis_manager_endpoint_info
 from webapp.github import create_file_pr, update_file_pr, GithubUser, GitHubAuth, GitHubRepoAPI, GithubRequestException, GithubReferenceExistsException, GithubNotFoundException
 
@@ -55,6 +61,7 @@ except ImportError as e:
 
 
 class InvalidArgumentsError(Exception): pass
+class NotFoundError(Exception): pass
 class AuthenticationFailedError(Exception): pass
 
 
@@ -107,6 +114,10 @@ app.config.from_pyfile("config.py", silent=True)
 if "TOPOLOGY_CONFIG" in os.environ:
     app.config.from_envvar("TOPOLOGY_CONFIG", silent=False)
 
+# The WSGI scripts set this to run one data loader process and reader processes (see docker/apache.conf)
+if "TOPOLOGY_DATA_SNAPSHOT_ROLE" in os.environ:
+    app.config["DATA_SNAPSHOT_ROLE"] = os.environ["TOPOLOGY_DATA_SNAPSHOT_ROLE"]
+
 if "AUTH" in app.config:
     if app.debug:
         default_authorized = app.config["AUTH"]
@@ -118,6 +129,8 @@ if "LOGLEVEL" in app.config:
 
 _verify_config(app.config)
 
+configure_yaml_cache(app.config)
+
 
 @app.errorhandler(AuthenticationFailedError)
 def _handle_authentication_failed(err):
@@ -178,16 +191,24 @@ except (TypeError, ValueError) as err:
 csrf = CSRFProtect()
 csrf.init_app(app)
 
+# Encoded bodies of the responses for the data endpoints, reused until the data is reloaded
+response_cache = ResponseCache(app.config.get("RESPONSE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Downtime listings depend on the current time, not just on the data
+DOWNTIME_RESPONSE_TTL = 60  # seconds
+
 #############################################################################
 # Background update thread
-# Run when the topology cache is 2/3 to expiration
-bg_update_freq = max(global_data.topology.cache_lifetime*2/3, 60) # seconds
+# Periodically update all the cached data before it expires (see GlobalData.refresh_all())
+bg_update_freq = app.config.get("BACKGROUND_UPDATE_INTERVAL", 30)  # seconds
 bg_update_thread = threading.Thread()
 
 def bg_update_run():
     '''Background update task'''
     app.logger.debug('Background update started')
-    global_data.update_topology()
+    try:
+        global_data.refresh_all()
+    except Exception:
+        app.logger.exception('Background update failed')
 
     # Add +/- 10% random offset to avoid thundering herds
     delay = bg_update_freq
@@ -200,11 +221,13 @@ def bg_update_run():
     bg_update_thread.start()
     app.logger.info('Background update complete')
 
-# Start background update thread
-bg_update_thread = threading.Timer(bg_update_freq, bg_update_run, ())
-# Make it a daemon thread, so interpreter won't wait on it when exiting
-bg_update_thread.daemon = True
-bg_update_thread.start()
+# Start background update thread; its first run does the initial load of the data
+# (the tests load the data themselves)
+if not os.environ.get('TESTING', False):
+    bg_update_thread = threading.Timer(0, bg_update_run, ())
+    # Make it a daemon thread, so interpreter won't wait on it when exiting
+    bg_update_thread.daemon = True
+    bg_update_thread.start()
 #############################################################################
 
 
@@ -214,7 +237,7 @@ def _fix_unicode(text):
 
 @app.after_request
 def set_cache_control(response):
-    if response.status_code == 200:
+    if response.status_code in (200, 304):
         # Cache results for 300s
         response.cache_control.max_age = 300
         # Serve an expired entry for up to 100s while refreshing in the background
@@ -233,12 +256,11 @@ def map():
 
 @app.route('/api/resource_group_summary')
 def resource_summary():
-    data = global_data.get_topology().get_resource_summary()["ResourceSummary"]["ResourceGroup"]
+    def build():
+        data = global_data.get_topology().get_resource_summary()["ResourceSummary"]["ResourceGroup"]
+        return to_json_bytes(simplify_attr_list(data, namekey='GroupName', del_name=False))
 
-    return Response(
-        to_json_bytes(simplify_attr_list(data, namekey='GroupName', del_name=False)),
-        mimetype="application/json"
-    )
+    return _cached_response(build, "application/json", [global_data.topology])
 
 @app.route('/schema/<xsdfile>')
 def schema(xsdfile):
@@ -252,7 +274,8 @@ def schema(xsdfile):
 @app.route('/miscuser/xml')
 @cache_control_private
 def miscuser_xml():
-    return Response(to_xml_bytes(global_data.get_contacts_data().get_tree(_get_authorized())),
+    # Not cached (it depends on who's asking), so stream it instead of building it all first
+    return Response(iter_xml_bytes(global_data.get_contacts_data().get_tree(_get_authorized())),
                     mimetype='text/xml')
 
 
@@ -382,65 +405,130 @@ def institutions():
 
 @app.route('/miscproject/xml')
 def miscproject_xml():
-    return Response(to_xml_bytes(global_data.get_projects()), mimetype='text/xml')
+    return _cached_response(lambda: to_xml_bytes(global_data.get_projects()), "text/xml", [global_data.projects])
 
 
 @app.route('/miscproject/json')
 @support_cors
 def miscproject_json():
-    projects = simplify_attr_list(global_data.get_projects()["Projects"]["Project"], namekey="Name", del_name=False)
-    return Response(to_json_bytes(projects), mimetype='application/json')
+    def build():
+        projects = simplify_attr_list(global_data.get_projects()["Projects"]["Project"], namekey="Name", del_name=False)
+        return to_json_bytes(projects)
+
+    return _cached_response(build, "application/json", [global_data.projects])
 
 
 @app.route('/miscsite/json')
 @support_cors
 def miscsite_json():
-    sites = {name: site.get_tree() for name, site in global_data.get_topology().sites.items()}
-    return Response(to_json_bytes(sites), mimetype='application/json')
+    def build():
+        sites = {name: site.get_tree() for name, site in global_data.get_topology().sites.items()}
+        return to_json_bytes(sites)
+
+    return _cached_response(build, "application/json", [global_data.topology])
 
 
 @app.route('/miscfacility/json')
 @support_cors
 def miscfacility_json():
-    facilities = {name: facility.get_tree() for name, facility in global_data.get_topology().facilities.items()}
-    return Response(to_json_bytes(facilities), mimetype='application/json')
+    def build():
+        facilities = {name: facility.get_tree() for name, facility in global_data.get_topology().facilities.items()}
+        return to_json_bytes(facilities)
+
+    return _cached_response(build, "application/json", [global_data.topology])
+
+def _get_resource_tree(resource: Resource) -> Dict:
+    return {
+        "Name": resource.name,
+        "Site": resource.rg.site.name,
+        "Facility": resource.rg.site.facility.name,
+        "ResourceGroup": resource.rg.name,
+        **resource.get_tree()
+    }
 
 @app.route('/miscresource/json')
 @support_cors
 def miscresource_json():
-    resources = {}
-    topology = global_data.get_topology()
-    for rg in topology.rgs.values():
-        for resource in rg.resources_by_name.values():
-            resources[resource.name] = {
-                "Name": resource.name,
-                "Site": rg.site.name,
-                "Facility": rg.site.facility.name,
-                "ResourceGroup": rg.name,
-                **resource.get_tree()
-            }
-
-    return Response(to_json_bytes(resources), mimetype='application/json')
+    def build():
+        resources = {}
+        topology = global_data.get_topology()
+        for rg in topology.rgs.values():
+            for resource in rg.resources_by_name.values():
+                resources[resource.name] = _get_resource_tree(resource)
+        return to_json_bytes(resources)
+
+    return _cached_response(build, "application/json", [global_data.topology])
+
+@app.route('/api/resource')
+@support_cors
+def resource_json():
+    """The resources with the given FQDN, in the same format as /miscresource/json"""
+    fqdn = request.args.get("fqdn", "").lower()
+    if not fqdn:
+        return Response("FQDN not specified", mimetype="text/plain", status=400)
+    resources = global_data.get_topology().resources_by_fqdn.get(fqdn)
+    if not resources:
+        return Response("No resource with FQDN " + fqdn, mimetype="text/plain", status=404)
+    return _cached_response(lambda: to_json_bytes({r.name: _get_resource_tree(r) for r in resources}),
+                            "application/json", [global_data.topology], args=(fqdn,))
+
+@app.route('/api/resource_group/<name>')
+@support_cors
+def resource_group_json(name):
+    """A resource group in the same format as /api/resource_group_summary"""
+    rg = global_data.get_topology().rgs_by_name.get(name)
+    def build():
+        tree = rg and rg.get_tree()
+        if not tree:
+            raise NotFoundError(name)
+        return to_json_bytes(tree)
+
+    try:
+        return _cached_response(build, "application/json", [global_data.topology], args=(name,))
+    except NotFoundError:
+        return Response("No resource group named " + name, mimetype="text/plain", status=404)
+
+@app.route('/api/site/<name>/resources')
+@support_cors
+def site_resources_json(name):
+    """The resources of a site, in the same format as /miscresource/json"""
+    site = global_data.get_topology().sites.get(name)
+    if not site:
+        return Response("No site named " + name, mimetype="text/plain", status=404)
+    def build():
+        resources = {}
+        for rg in site.resource_groups_by_name.values():
+            for resource in rg.resources:
+                resources[resource.name] = _get_resource_tree(resource)
+        return to_json_bytes(resources)
+
+    return _cached_response(build, "application/json", [global_data.topology], args=(name,))
 
 @app.route('/vosummary/xml')
 def vosummary_xml():
-    return _get_xml_or_fail(global_data.get_vos_data().get_tree, request.args)
+    return _get_xml_or_fail(lambda authorized, filters: global_data.get_vos_data().get_tree(authorized, filters),
+                            request.args, [global_data.vos_data])
 
 @app.route('/vosummary/json')
 def vosummary_json():
-    return Response(to_json_bytes(
-        simplify_attr_list(global_data.get_vos_data().get_expansion(), namekey='Name')
-    ), mimetype="application/json")
+    def build():
+        return to_json_bytes(simplify_attr_list(global_data.get_vos_data().get_expansion(), namekey='Name'))
+
+    return _cached_response(build, "application/json", [global_data.vos_data])
 
 
 @app.route('/rgsummary/xml')
 def rgsummary_xml():
-    return _get_xml_or_fail(global_data.get_topology().get_resource_summary, request.args)
+    return _get_xml_or_fail(
+        lambda authorized, filters: global_data.get_topology().get_resource_summary(authorized, filters),
+        request.args, [global_data.topology, global_data.vos_data])
 
 
 @app.route('/rgdowntime/xml')
 def rgdowntime_xml():
-    return _get_xml_or_fail(global_data.get_topology().get_downtimes, request.args)
+    return _get_xml_or_fail(
+        lambda authorized, filters: global_data.get_topology().get_downtimes(authorized, filters),
+        request.args, [global_data.topology, global_data.vos_data], ttl=DOWNTIME_RESPONSE_TTL)
 
 
 @app.route('/rgdowntime/ical')
@@ -449,28 +537,55 @@ def rgdowntime_ical():
         filters = get_filters_from_args(request.args)
     except InvalidArgumentsError as e:
         return Response("Invalid arguments: " + str(e), status=400)
-    response = make_response(global_data.get_topology().get_downtimes_ical(False, filters).to_ical())
+    response = _cached_response(
+        lambda: global_data.get_topology().get_downtimes_ical(False, filters),
+        "text/calendar",
+        [global_data.topology, global_data.vos_data],
+        args=filters.cache_key(),
+        ttl=DOWNTIME_RESPONSE_TTL,
+    )
     response.headers.set("Content-Type", "text/calendar")
     response.headers.set("Content-Disposition", "attachment", filename="downtime.ics")
     return response
 
+@app.route("/changes")
+@support_cors
+def changes():
+    since = request.args.get("since", "")
+    if not COMMIT_RE.fullmatch(since):
+        return Response("'since' must be the hash of a commit of the topology repo", status=400)
+    # The data the changes can be looked up in must have them all
+    snapshot = global_data.get_snapshot(CHANGES_DATASETS)
+    commits = frozenset(commit for name, commit in zip(DataSnapshot.DATASETS, snapshot.commits)
+                        if name in CHANGES_DATASETS)
+    if None in commits:
+        return Response("The commit the data was loaded from is unknown", status=503)
+    data_dir = global_data.topology_data_dir
+    current = oldest_commit(data_dir, commits)
+    if not current:
+        return Response("The data is being reloaded", status=503)
+    changes_info = None
+    if len(since) == 40:
+        changes_info = get_cached_changes(data_dir, since.lower(), current)
+    if changes_info is None:
+        old = git_resolve_commit(data_dir, since)
+        if not old:
+            return Response("Unknown commit " + since, status=400)
+        changes_info = get_changes(data_dir, old, current)
+        if changes_info is None:
+            return Response("Unable to compare %s to %s" % (old, current), status=503)
+    # The changes between two commits never change
+    return _cached_response(lambda: to_json_bytes(changes_info), "application/json", [],
+                            args=(changes_info["since"], current))
+
 @app.route('/resources/stashcache-files')
 @support_cors
 def resources_stashcache_files():
-    resource_files = {}
-    topology = global_data.get_topology()
-    for rg in topology.rgs.values():
-        for resource in rg.resources_by_name.values():
-            stashcache_files = resource.get_stashcache_files(global_data)
-
-            if not stashcache_files:
-                continue
-
-            resource_files[resource.name] = {
-                **stashcache_files
-            }
-
-    return Response(to_json_bytes(resource_files), mimetype='application/json')
+    if not stashcache:
+        return Response("Can't get stashcache files: stashcache module unavailable", status=503)
+    snapshot = _get_stashcache_data()
+    return _cached_response(lambda: to_json_bytes(stashcache.get_resources_stashcache_files(snapshot)),
+                            "application/json", [snapshot])
 
 @app.route("/resource-files")
 def resource_files():
@@ -508,8 +623,10 @@ def cache_grid_mapfile():
     if not fqdn:
         return Response("FQDN of cache server required in the 'fqdn' argument", status=400)
     try:
-        return Response(stashcache.generate_cache_grid_mapfile(global_data, fqdn, suppress_errors=False),
-                        mimetype="text/plain")
+        snapshot = _get_stashcache_data()
+        return _cached_response(
+            lambda: stashcache.generate_cache_grid_mapfile(snapshot, fqdn, suppress_errors=False).encode(),
+            "text/plain", [snapshot], args=(fqdn,))
     except ResourceNotRegistered as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -547,8 +664,10 @@ def origin_grid_mapfile():
     if not fqdn:
         return Response("FQDN of origin server required in the 'fqdn' argument", status=400)
     try:
-        return Response(stashcache.generate_origin_grid_mapfile(global_data, fqdn, suppress_errors=False),
-                        mimetype="text/plain")
+        snapshot = _get_stashcache_data()
+        return _cached_response(
+            lambda: stashcache.generate_origin_grid_mapfile(snapshot, fqdn, suppress_errors=False).encode(),
+            "text/plain", [snapshot], args=(fqdn,))
     except ResourceNotRegistered as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -577,10 +696,10 @@ def scitokens():
 
     try:
         if cache_fqdn:
-            cache_scitokens = stashcache.generate_cache_scitokens(global_data, cache_fqdn, suppress_errors=False)
+            cache_scitokens = stashcache.generate_cache_scitokens(_get_stashcache_data(), cache_fqdn, suppress_errors=False)
             return Response(cache_scitokens, mimetype="text/plain")
         elif origin_fqdn:
-            origin_scitokens = stashcache.generate_origin_scitokens(global_data, origin_fqdn, suppress_errors=False)
+            origin_scitokens = stashcache.generate_origin_scitokens(_get_stashcache_data(), origin_fqdn, suppress_errors=False)
             return Response(origin_scitokens, mimetype="text/plain")
     except ResourceNotRegistered as e:
         return Response("# {}\n"
@@ -617,8 +736,15 @@ def stashcache_namespaces_json():
         filters.itb = is_true(request.args.get("itb", False))
 
     try:
-        return Response(to_json_bytes(stashcache.get_namespaces_info(global_data, filters=filters)),
-                        mimetype='application/json')
+        snapshot = _get_stashcache_data()
+        return _cached_response(
+            lambda: to_json_bytes(stashcache.get_namespaces_info(snapshot, filters=filters)),
+            "application/json",
+            [snapshot],
+            args=(filters.production, filters.itb, filters.include_inactive, filters.include_downed),
+            # Which caches are in downtime depends on the current time
+            ttl=None if filters.include_downed else DOWNTIME_RESPONSE_TTL,
+        )
     except ResourceNotRegistered as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -647,6 +773,8 @@ def oasis_managers():
         return Response("OSG_LDAP_PASSFILE not configured; "
                         "OASIS Managers info unavailable", status=503)
     mgrs = get_oasis_manager_endpoint_info(global_data, vo, cilogon_pass)
+    if mgrs is None:
+        return Response("Error getting OASIS Managers info from LDAP", status=503)
     return Response(to_json_bytes(mgrs), mimetype='application/json')
 
 
@@ -659,9 +787,10 @@ def _get_cache_authfile(public_only):
             generate_function = stashcache.generate_public_cache_authfile
         else:
             generate_function = stashcache.generate_cache_authfile
-        auth = generate_function(global_data,
-                                 fqdn=cache_fqdn,
-                                 suppress_errors=False)
+        snapshot = _get_stashcache_data()
+        return _cached_response(
+            lambda: generate_function(snapshot, fqdn=cache_fqdn, suppress_errors=False).encode(),
+            "text/plain", [snapshot], args=(cache_fqdn,))
     except (ResourceNotRegistered, ResourceMissingServices) as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -675,7 +804,6 @@ def _get_cache_authfile(public_only):
     except Exception:
         app.log_exception(sys.exc_info())
         return Response("Server error getting authfile, please contact help@osg-htc.org", status=503)
-    return Response(auth, mimetype="text/plain")
 
 
 def _get_origin_authfile(public_only):
@@ -684,8 +812,12 @@ def _get_origin_authfile(public_only):
     if 'fqdn' not in request.args:
         return Response("FQDN of origin server required in the 'fqdn' argument", status=400)
     try:
-        auth = stashcache.generate_origin_authfile(global_data=global_data, fqdn=request.args['fqdn'],
-                                                   suppress_errors=False, public_origin=public_only)
+        fqdn = request.args['fqdn']
+        snapshot = _get_stashcache_data()
+        return _cached_response(
+            lambda: stashcache.generate_origin_authfile(global_data=snapshot, fqdn=fqdn, suppress_errors=False,
+                                                        public_origin=public_only).encode(),
+            "text/plain", [snapshot], args=(fqdn,))
     except (ResourceNotRegistered, ResourceMissingServices) as e:
         return Response("# {}\n"
                         "# Please check your query or contact help@osg-htc.org\n"
@@ -699,7 +831,6 @@ def _get_origin_authfile(public_only):
     except Exception:
         app.log_exception(sys.exc_info())
         return Response("Server error getting authfile, please contact help@osg-htc.org", status=503)
-    return Response(auth, mimetype="text/plain")
 
 
 def _get_scitoken_file(fqdn, get_scitoken_function):
@@ -711,8 +842,9 @@ def _get_scitoken_file(fqdn, get_scitoken_function):
         return Response("FQDN of cache or origin server required in the 'fqdn' argument", status=400)
 
     try:
-        scitoken_file = get_scitoken_function(fqdn)
-        return Response(scitoken_file, mimetype="text/plain")
+        snapshot = _get_stashcache_data()
+        return _cached_response(lambda: get_scitoken_function(snapshot, fqdn).encode(), "text/plain", [snapshot],
+                                args=(fqdn,))
 
     except ResourceNotRegistered as e:
         return Response("# {}\n"
@@ -732,8 +864,8 @@ def _get_scitoken_file(fqdn, get_scitoken_function):
 def _get_cache_scitoken_file():
     fqdn_arg = request.args.get("fqdn")
 
-    def get_scitoken_function(fqdn):
-        return stashcache.generate_cache_scitokens(global_data=global_data, fqdn=fqdn, suppress_errors=False)
+    def get_scitoken_function(snapshot, fqdn):
+        return stashcache.generate_cache_scitokens(global_data=snapshot, fqdn=fqdn, suppress_errors=False)
 
     return _get_scitoken_file(fqdn_arg, get_scitoken_function)
 
@@ -741,8 +873,8 @@ def _get_cache_scitoken_file():
 def _get_origin_scitoken_file():
     fqdn_arg = request.args.get("fqdn")
 
-    def get_scitoken_function(fqdn):
-        return stashcache.generate_origin_scitokens(global_data=global_data, fqdn=fqdn, suppress_errors=False)
+    def get_scitoken_function(snapshot, fqdn):
+        return stashcache.generate_origin_scitokens(global_data=snapshot, fqdn=fqdn, suppress_errors=False)
 
     return _get_scitoken_file(fqdn_arg, get_scitoken_function)
 
@@ -1147,23 +1279,66 @@ def get_filters_from_args(args) -> Filters:
                                             " (These may be specified multiple times for multiple IDs.)"\
                                             .format(description, filter_key))
 
+    # The RGs, resources, downtimes and VOs are checked for membership in these
+    for attr in ["facility_id", "rg_id", "service_id", "support_center_id", "site_id", "vo_id", "voown_id"]:
+        setattr(filters, attr, frozenset(getattr(filters, attr)))
     if filters.voown_id:
         filters.populate_voown_name(global_data.get_vos_data().get_vo_id_to_name())
 
     return filters
 
 
-def _get_xml_or_fail(getter_function, args):
+def _get_xml_or_fail(getter_function, args, cached_data: List[CachedData], ttl: Optional[float] = None):
     try:
         filters = get_filters_from_args(args)
     except InvalidArgumentsError as e:
         return Response("Invalid arguments: " + str(e), status=400)
-    return Response(
-        to_xml_bytes(getter_function(_get_authorized(), filters)),
-        mimetype="text/xml"
+    authorized = _get_authorized()
+    return _cached_response(
+        lambda: to_xml_bytes(getter_function(authorized, filters)),
+        "text/xml",
+        cached_data,
+        args=filters.cache_key(),
+        authorized=authorized,
+        ttl=ttl,
     )
 
 
+def _get_stashcache_data() -> DataSnapshot:
+    """The data the stashcache functions use: the topology and VO data"""
+    return global_data.get_snapshot(["topology", "vos_data"])
+
+
+def _cached_response(build_body: Callable[[], bytes], mimetype: str,
+                     cached_data: List[Union[CachedData, DataSnapshot]],
+                     args=(), authorized=False, ttl: Optional[float] = None) -> Response:
+    """
+    Return a response with the body returned by build_body(), which is built from
+    the data in `cached_data` (CachedData objects, or a DataSnapshot for bodies built
+    from several datasets).  The body is cached and reused for requests to the same
+    endpoint with the same `args` and `authorized` flag until that data is reloaded
+    (or `ttl` seconds have passed, if given).
+
+    The response has an ETag; conditional requests get a 304 if the client's copy
+    is still current.  There is no Last-Modified time: the time the data was loaded
+    differs between processes even for the same data, and is no indication of which
+    data is newer.
+    """
+    # Get the generations before build_body() gets the data: if the data is reloaded
+    # in between, the cached body is newer than its key says, never older.
+    generations = tuple(cd.generation for cd in cached_data)
+    key = (request.endpoint, args, authorized, generations)
+    cached = response_cache.get(key)
+    if cached is None:
+        body = build_body()
+        etag = response_cache.put(key, body, ttl)
+    else:
+        body, etag = cached
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+
 def _get_authorized():
     """
     Determine if the client is authorized
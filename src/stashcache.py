@@ -1,5 +1,6 @@
-from collections import defaultdict
-from typing import Dict, List, Optional, Sequence
+from collections import defaultdict, OrderedDict
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Set, TypeVar
 
 from webapp.common import is_null, PreJSON, XROOTD_CACHE_SERVER, XROOTD_ORIGIN_SERVER, PELICAN_CACHE, PELICAN_ORIGIN, \
     NamespacesFilters
@@ -16,6 +17,8 @@ log = logging.getLogger(__name__)
 ANY = "ANY"
 ANY_PUBLIC = "ANY_PUBLIC"
 
+T = TypeVar("T")
+
 def _log_or_raise(suppress_errors: bool, an_exception: BaseException, logmethod=log.debug):
     if suppress_errors:
         logmethod("%s %s", type(an_exception), an_exception)
@@ -118,16 +121,48 @@ def namespace_allows_cache_resource(namespace: Namespace, cache: Optional[Resour
     return cache and cache.name in namespace.allowed_caches
 
 
-def get_supported_caches_for_namespace(namespace: Namespace, topology: Topology) -> List[Resource]:
+class _ResourcesByAllowedVO:
+    """The names of a set of caches or origins, indexed by the VOs their AllowedVOs
+    lists allow, so that the ones allowing a namespace (as in resource_allows_namespace())
+    can be found with a few set operations.
+    """
+    def __init__(self, resources: Iterable[Resource]):
+        self.allowing_any = set()  # type: Set[str]
+        self.allowing_any_public = set()  # type: Set[str]
+        self.by_vo_name = defaultdict(set)  # type: defaultdict[str, Set[str]]
+        for resource in resources:
+            for allowed_vo in resource.data.get("AllowedVOs", []):
+                if allowed_vo == ANY:
+                    self.allowing_any.add(resource.name)
+                elif allowed_vo == ANY_PUBLIC:
+                    self.allowing_any_public.add(resource.name)
+                else:
+                    self.by_vo_name[allowed_vo].add(resource.name)
+
+    def allowing_namespace(self, namespace: Namespace) -> Set[str]:
+        names = self.allowing_any | self.by_vo_name.get(namespace.vo_name, set())
+        if namespace.is_public():
+            names |= self.allowing_any_public
+        return names
+
+
+def get_cache_resources(topology: Topology) -> List[Resource]:
+    """Return a list of Resource objects of all (xrootd or pelican) caches."""
+    return [resource
+            for group in topology.get_resource_group_list()
+            for resource in group.resources
+            if (resource.has_xrootd_cache or
+                resource.has_pelican_cache)]
+
+
+def get_supported_caches_for_namespace(namespace: Namespace, topology: Topology,
+                                       all_caches: Optional[List[Resource]] = None) -> List[Resource]:
     """Return a list of Resource objects of all caches that support a namespace.  This means the cache allows
     the namespace, AND the namespace allows the cache.
+    `all_caches` is the result of get_cache_resources(topology), if the caller already has it.
     """
-    resource_groups = topology.get_resource_group_list()
-    all_caches = [resource
-                  for group in resource_groups
-                  for resource in group.resources
-                  if (resource.has_xrootd_cache or
-                      resource.has_pelican_cache)]
+    if all_caches is None:
+        all_caches = get_cache_resources(topology)
     return [cache
             for cache in all_caches
             if namespace_allows_cache_resource(namespace, cache)
@@ -169,8 +204,15 @@ class _IdNamespaceData:
 
     @classmethod
     def for_origin(cls, topology: Topology, vos_data: VOsData,
-                   origin_resource: Optional[Resource]) -> "_IdNamespaceData":
+                   origin_resource: Optional[Resource],
+                   get_supported_caches: Optional[Callable[[Namespace], List[Resource]]] = None) -> "_IdNamespaceData":
+        """`get_supported_caches` returns the caches that support a namespace;
+        defaults to get_supported_caches_for_namespace() for `topology`.
+        """
         self = cls()
+        if get_supported_caches is None:
+            all_caches = get_cache_resources(topology)
+            get_supported_caches = lambda ns: get_supported_caches_for_namespace(ns, topology, all_caches)
         for vo_name, stashcache_obj in vos_data.stashcache_by_vo_name.items():
             for path, namespace in stashcache_obj.namespaces.items():
                 if not namespace_allows_origin_resource(namespace, origin_resource):
@@ -187,7 +229,7 @@ class _IdNamespaceData:
 
                 allowed_resources = [origin_resource]
                 # Add caches
-                allowed_caches = get_supported_caches_for_namespace(namespace, topology)
+                allowed_caches = get_supported_caches(namespace)
                 if allowed_caches:
                     allowed_resources.extend(allowed_caches)
                 else:
@@ -215,6 +257,73 @@ class _IdNamespaceData:
         return self
 
 
+class _DataIndex:
+    """Results derived from one version of the topology and VO data (e.g. the
+    authfiles for each cache and origin), computed on first use and then reused
+    until the data changes.  Get one with _get_index().
+    """
+    def __init__(self, topology: Topology, vos_data: VOsData):
+        self.topology = topology
+        self.vos_data = vos_data
+        self._memo = {}  # type: Dict[Hashable, object]
+
+    def memoize(self, key: Hashable, func: Callable[[], T]) -> T:
+        """Return func(), computing it only the first time it is asked for under `key`.
+        DataErrors are remembered and raised again as well.
+        """
+        try:
+            result = self._memo[key]
+        except KeyError:
+            try:
+                result = func()
+            except DataError as err:
+                result = err
+            self._memo[key] = result
+        if isinstance(result, DataError):
+            raise result.with_traceback(None)
+        return result
+
+    def idns_for_cache(self, cache_resource: Optional[Resource]) -> _IdNamespaceData:
+        return self.memoize(("idns_for_cache", cache_resource),
+                            lambda: _IdNamespaceData.for_cache(self.vos_data, cache_resource))
+
+    def idns_for_origin(self, origin_resource: Optional[Resource]) -> _IdNamespaceData:
+        return self.memoize(("idns_for_origin", origin_resource),
+                            lambda: _IdNamespaceData.for_origin(self.topology, self.vos_data, origin_resource,
+                                                                self.supported_caches_for_namespace))
+
+    def cache_resources(self) -> List[Resource]:
+        return self.memoize("cache_resources", lambda: get_cache_resources(self.topology))
+
+    def supported_caches_for_namespace(self, namespace: Namespace) -> List[Resource]:
+        return self.memoize(("supported_caches", namespace),
+                            lambda: get_supported_caches_for_namespace(namespace, self.topology,
+                                                                       self.cache_resources()))
+
+
+_INDEX_CACHE_SIZE = 4
+_indexes = OrderedDict()  # type: OrderedDict[tuple, _DataIndex]
+_indexes_lock = threading.Lock()
+
+
+def _get_index(topology: Topology, vos_data: VOsData) -> _DataIndex:
+    """Return the _DataIndex for the current version of `topology` and `vos_data`.
+    A few indexes are kept so that requests still using the previous data don't
+    thrash the cache after a reload.
+    """
+    key = (id(topology), topology.serial, id(vos_data), vos_data.serial)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        # An index holds references to its data, so the ids in the key can't be reused while it's cached
+        if index is None:
+            index = _indexes[key] = _DataIndex(topology, vos_data)
+            while len(_indexes) > _INDEX_CACHE_SIZE:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(key)
+        return index
+
+
 def generate_cache_authfile(global_data: GlobalData,
                             fqdn=None,
                             suppress_errors=True) -> str:
@@ -230,10 +339,12 @@ def generate_cache_authfile(global_data: GlobalData,
         if not resource:
             return ""
 
-    idns = _IdNamespaceData.for_cache(
-        vos_data=vos_data,
-        cache_resource=resource,
-    )
+    index = _get_index(topology, vos_data)
+    return index.memoize(("cache_authfile", resource), lambda: _generate_cache_authfile(index, resource))
+
+
+def _generate_cache_authfile(index: _DataIndex, resource: Optional[Resource]) -> str:
+    idns = index.idns_for_cache(resource)
 
     if not idns.id_to_paths:
         if not idns.public_paths:
@@ -264,10 +375,12 @@ def generate_public_cache_authfile(global_data: GlobalData, fqdn=None, suppress_
         if not resource:
             return ""
 
-    idns = _IdNamespaceData.for_cache(
-        vos_data=vos_data,
-        cache_resource=resource,
-    )
+    index = _get_index(topology, vos_data)
+    return index.memoize(("public_cache_authfile", resource), lambda: _generate_public_cache_authfile(index, resource))
+
+
+def _generate_public_cache_authfile(index: _DataIndex, resource: Optional[Resource]) -> str:
+    idns = index.idns_for_cache(resource)
 
     if not idns.public_paths:
         if not idns.id_to_paths:
@@ -304,11 +417,11 @@ def generate_cache_grid_mapfile(global_data: GlobalData,
         if not resource:
             return ""
 
-    idns = _IdNamespaceData.for_cache(
-        vos_data=vos_data,
-        cache_resource=resource,
-    )
+    index = _get_index(topology, vos_data)
+    return index.memoize(("cache_grid_mapfile", resource), lambda: _generate_grid_mapfile(index.idns_for_cache(resource)))
 
+
+def _generate_grid_mapfile(idns: _IdNamespaceData) -> str:
     grid_mapfile_lines = []
     grid_mapfile_lines.extend(idns.warnings_auth)
     grid_mapfile_lines.extend(sorted(idns.grid_mapfile_lines))
@@ -335,6 +448,11 @@ def generate_cache_scitokens(global_data: GlobalData, fqdn: str, suppress_errors
     if not cache_resource:
         return ""
 
+    return _get_index(topology, vos_data).memoize(("cache_scitokens", cache_resource),
+                                                  lambda: _generate_cache_scitokens(vos_data, cache_resource))
+
+
+def _generate_cache_scitokens(vos_data: VOsData, cache_resource: Resource) -> str:
     template = """\
 [Global]
 audience = {allowed_vos_str}
@@ -387,7 +505,13 @@ def generate_origin_authfile(global_data: GlobalData, fqdn: str, suppress_errors
         if not origin_resource:
             return ""
 
-    idns = _IdNamespaceData.for_origin(topology, vos_data, origin_resource)
+    index = _get_index(topology, vos_data)
+    return index.memoize(("origin_authfile", origin_resource, public_origin),
+                         lambda: _generate_origin_authfile(index, origin_resource, public_origin))
+
+
+def _generate_origin_authfile(index: _DataIndex, origin_resource: Optional[Resource], public_origin: bool) -> str:
+    idns = index.idns_for_origin(origin_resource)
 
     if not idns.id_to_paths and not idns.public_paths:
         raise DataError("Origin does not support any namespaces")  # TODO Catch this in the CI
@@ -432,13 +556,9 @@ def generate_origin_grid_mapfile(global_data: GlobalData, fqdn: str, suppress_er
         if not origin_resource:
             return ""
 
-    idns = _IdNamespaceData.for_origin(topology, vos_data, origin_resource)
-
-    grid_mapfile_lines = []
-    grid_mapfile_lines.extend(idns.warnings_auth)
-    grid_mapfile_lines.extend(sorted(idns.grid_mapfile_lines))
-
-    return "\n".join(grid_mapfile_lines) + "\n"
+    index = _get_index(topology, vos_data)
+    return index.memoize(("origin_grid_mapfile", origin_resource),
+                         lambda: _generate_grid_mapfile(index.idns_for_origin(origin_resource)))
 
 
 def generate_origin_scitokens(global_data: GlobalData, fqdn: str, suppress_errors=True) -> str:
@@ -460,6 +580,11 @@ def generate_origin_scitokens(global_data: GlobalData, fqdn: str, suppress_error
     if not origin_resource:
         return ""
 
+    return _get_index(topology, vos_data).memoize(("origin_scitokens", origin_resource),
+                                                  lambda: _generate_origin_scitokens(vos_data, origin_resource))
+
+
+def _generate_origin_scitokens(vos_data: VOsData, origin_resource: Resource) -> str:
     template = """\
 [Global]
 audience = {allowed_vos_str}
@@ -495,6 +620,78 @@ audience = {allowed_vos_str}
     return template.format(**locals()).rstrip() + "\n"
 
 
+_CACHE_FILE_GENERATORS = [
+    ("CacheAuthfilePublic", lambda global_data, fqdn: generate_public_cache_authfile(global_data, fqdn=fqdn,
+                                                                                     suppress_errors=False)),
+    ("CacheAuthfile", lambda global_data, fqdn: generate_cache_authfile(global_data, fqdn=fqdn,
+                                                                        suppress_errors=False)),
+    ("CacheScitokens", lambda global_data, fqdn: generate_cache_scitokens(global_data, fqdn=fqdn,
+                                                                          suppress_errors=False)),
+]
+_ORIGIN_FILE_GENERATORS = [
+    ("OriginAuthfilePublic", lambda global_data, fqdn: generate_origin_authfile(global_data, fqdn=fqdn,
+                                                                                suppress_errors=False,
+                                                                                public_origin=True)),
+    ("OriginAuthfile", lambda global_data, fqdn: generate_origin_authfile(global_data, fqdn=fqdn,
+                                                                          suppress_errors=False,
+                                                                          public_origin=False)),
+    ("OriginScitokens", lambda global_data, fqdn: generate_origin_scitokens(global_data, fqdn=fqdn,
+                                                                            suppress_errors=False)),
+]
+
+
+def get_resource_stashcache_files(global_data: GlobalData, resource: Resource) -> Dict[str, str]:
+    """Return the cache and origin files of a resource (the ones that are not empty),
+    keyed by their name in the /resources/stashcache-files JSON.
+
+    The result is shared by all callers with the same data; do not modify it.
+    """
+    topology = global_data.get_topology()
+    vos_data = global_data.get_vos_data()
+    return _get_index(topology, vos_data).memoize(("stashcache_files", resource),
+                                                  lambda: _get_resource_stashcache_files(global_data, resource))
+
+
+def _get_resource_stashcache_files(global_data: GlobalData, resource: Resource) -> Dict[str, str]:
+    generators = []
+    if XROOTD_CACHE_SERVER in resource.service_names:
+        generators.extend(_CACHE_FILE_GENERATORS)
+    if XROOTD_ORIGIN_SERVER in resource.service_names:
+        generators.extend(_ORIGIN_FILE_GENERATORS)
+
+    stashcache_files = {}
+    for file_name, file_generator in generators:
+        try:
+            contents = file_generator(global_data, resource.fqdn)
+        except (ValueError, DataError):
+            continue
+        if contents:
+            stashcache_files[file_name] = contents
+    return stashcache_files
+
+
+def get_resources_stashcache_files(global_data: GlobalData) -> Dict[str, Dict[str, str]]:
+    """Return the data for the /resources/stashcache-files JSON endpoint: the cache and
+    origin files of every resource that has any, keyed by resource name.
+
+    The result is shared by all callers with the same data; do not modify it.
+    """
+    topology = global_data.get_topology()
+    vos_data = global_data.get_vos_data()
+    return _get_index(topology, vos_data).memoize("resources_stashcache_files",
+                                                  lambda: _get_resources_stashcache_files(global_data, topology))
+
+
+def _get_resources_stashcache_files(global_data: GlobalData, topology: Topology) -> Dict[str, Dict[str, str]]:
+    resource_files = {}
+    for rg in topology.rgs.values():
+        for resource in rg.resources_by_name.values():
+            stashcache_files = get_resource_stashcache_files(global_data, resource)
+            if stashcache_files:
+                resource_files[resource.name] = stashcache_files
+    return resource_files
+
+
 def get_credential_generation_dict_for_namespace(ns: Namespace) -> Optional[Dict]:
     if not ns.credential_generation:
         return None
@@ -527,10 +724,22 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
     If `include_inactive` is True, caches/origins that are not marked as active are also included.
 
     NOTE: This is specific to XRootD caches and origins; Pelican caches and origins are not included.
+
+    The result is shared by all callers with the same data and filters; do not modify it.
     """
     if filters is None:
         filters = NamespacesFilters()
 
+    topology = global_data.get_topology()
+    vos_data = global_data.get_vos_data()
+    key = ("namespaces_info", filters.production, filters.itb, filters.include_inactive, filters.include_downed)
+    if not filters.include_downed:
+        # Which resources are in downtime changes over time
+        key += (topology.downtime_index.partition().serial,)
+    return _get_index(topology, vos_data).memoize(key, lambda: _get_namespaces_info(topology, vos_data, filters))
+
+
+def _get_namespaces_info(topology: Topology, vos_data: VOsData, filters: NamespacesFilters) -> PreJSON:
     # Helper functions
 
     def _service_resource_dict(
@@ -579,19 +788,15 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
             "scitokens": get_scitokens_list_for_namespace(ns),
         }
 
-        for cache_name, cache_resource_obj in cache_resource_objs.items():
-            if (resource_allows_namespace(cache_resource_obj, ns) and
-                    namespace_allows_cache_resource(ns, cache_resource_obj)):
-                nsdict["caches"].append(cache_resource_dicts[cache_name])
-
-        nsdict["caches"].sort(key=lambda d: d["resource"])
+        # Same as resource_allows_namespace() and namespace_allows_cache_resource() for each cache
+        cache_names = caches_by_allowed_vo.allowing_namespace(ns)
+        if ANY not in ns.allowed_caches:
+            cache_names = cache_names.intersection(ns.allowed_caches)
+        nsdict["caches"] = [cache_resource_dicts[name] for name in sorted(cache_names)]
 
-        for origin_name, origin_resource_obj in origin_resource_objs.items():
-            if (resource_allows_namespace(origin_resource_obj, ns) and
-                    namespace_allows_origin_resource(ns, origin_resource_obj)):
-                nsdict["origins"].append(origin_resource_dicts[origin_name])
-
-        nsdict["origins"].sort(key=lambda d: d["resource"])
+        # Same as resource_allows_namespace() and namespace_allows_origin_resource() for each origin
+        origin_names = origins_by_allowed_vo.allowing_namespace(ns).intersection(ns.allowed_origins)
+        nsdict["origins"] = [origin_resource_dicts[name] for name in sorted(origin_names)]
 
         return nsdict
 
@@ -600,10 +805,7 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
             t: Topology,
             service_name
     ):
-        if r.name not in t.present_downtimes_by_resource:
-            return False
-        downtimes = t.present_downtimes_by_resource[r.name]
-        for dt in downtimes:
+        for dt in t.get_present_downtimes(r.name):
             try:
                 if service_name in dt.service_names:
                     return True
@@ -619,9 +821,7 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
 
     # End helper functions
 
-    topology = global_data.get_topology()
     resource_groups: List[ResourceGroup] = topology.get_resource_group_list()
-    vos_data = global_data.get_vos_data()
 
     # Build a dict of cache resources
 
@@ -659,6 +859,9 @@ def get_namespaces_info(global_data: GlobalData, filters: Optional[NamespacesFil
                 origin_resource_objs[resource.name] = resource
                 origin_resource_dicts[resource.name] = _xrootd_origin_resource_dict(resource)
 
+    caches_by_allowed_vo = _ResourcesByAllowedVO(cache_resource_objs.values())
+    origins_by_allowed_vo = _ResourcesByAllowedVO(origin_resource_objs.values())
+
     result_namespaces = []
     for stashcache_obj in vos_data.stashcache_by_vo_name.values():
         for namespace in stashcache_obj.namespaces.values():
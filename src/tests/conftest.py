@@ -0,0 +1,15 @@
+import pytest
+
+from topology_repo import make_data_repo, make_topology_dir
+
+
+@pytest.fixture
+def topology_dir(tmp_path) -> str:
+    """A minimal topology tree containing a single RG with a downtime"""
+    return make_topology_dir(str(tmp_path / "topology"))
+
+
+@pytest.fixture
+def data_dir(topology_dir) -> str:
+    """A git repo containing topology_dir and the other data GlobalData loads"""
+    return make_data_repo(topology_dir)
@@ -1,6 +1,7 @@
 # pyright: reportOptionalMemberAccess=false, reportOptionalSubscript=false
 import re
 import flask
+import icalendar
 import pytest
 import warnings
 
@@ -10,6 +11,7 @@ import os
 import sys
 import csv
 import io
+import subprocess
 
 topdir = os.path.join(os.path.dirname(__file__), "..")
 sys.path.append(topdir)
@@ -25,8 +27,9 @@ warnings.filterwarnings(
     module=r"dateutil\.tz\.tz",
 )
 
-from app import app, global_data
-from webapp.topology import Facility, Site, Resource, ResourceGroup
+from app import app, get_filters_from_args, global_data
+from webapp.common import Filters, GRIDTYPE_1, GRIDTYPE_2, git_head_sha
+from webapp.topology import Facility, Site, Resource, ResourceGroup, Timeframe
 
 INVALID_USER = dict(
     username="invalid",
@@ -196,6 +199,170 @@ class TestAPI:
 
         assert tuple(json_tuples) == tuple(csv_tuples)
 
+    def test_response_cache(self, client: flask.Flask, mocker):
+        topology = global_data.get_topology()
+        get_resource_summary = mocker.spy(topology, "get_resource_summary")
+
+        response = client.get("/rgsummary/xml?active=on&active_value=1")
+        assert response.status_code == 200
+        assert client.get("/rgsummary/xml?active_value=1&active=on").data == response.data
+        assert get_resource_summary.call_count == 1, "the cached response should be reused"
+        assert client.get("/rgsummary/xml?active=on&active_value=1&foo=1").data == response.data
+        assert client.get("/rgsummary/xml?active=on&active_value=1&active_value=0").data == response.data
+        assert get_resource_summary.call_count == 1, "arguments that don't change the filters shouldn't matter"
+
+        client.get("/rgsummary/xml?active=on&active_value=0")
+        assert get_resource_summary.call_count == 2, "different filters need a different response"
+
+        global_data.topology.update(topology, global_data.topology.commit)
+        client.get("/rgsummary/xml?active=on&active_value=1")
+        assert get_resource_summary.call_count == 3, "reloading the data should invalidate the response"
+
+    def test_downtimes_ical(self, client: flask.Flask):
+        topology = global_data.get_topology()
+        for args, past_days in [("", 0), ("?downtime_attrs_showpast=30", 30), ("?downtime_attrs_showpast=all", -1)]:
+            response = client.get("/rgdowntime/ical" + args)
+            assert response.status_code == 200
+            assert response.headers["Content-Type"] == "text/calendar"
+
+            filters = Filters()
+            filters.past_days = past_days
+            cal = icalendar.Calendar()
+            cal.add("prodid", "-//Open Science Grid//Topology//EN")
+            cal.add("version", "2.0")
+            for timeframe in [Timeframe.PAST, Timeframe.PRESENT, Timeframe.FUTURE]:
+                for dt in topology.downtime_index.downtimes:
+                    event = dt.timeframe == timeframe and dt.get_ical_event(filters)
+                    if event:
+                        cal.add_component(event)
+            assert response.data == cal.to_ical(), args
+
+    def test_osg_downtimes_script(self, client: flask.Flask):
+        script = os.path.join(topdir, "..", "bin", "osg-downtimes")
+        output = subprocess.run([sys.executable, script], check=True, stdout=subprocess.PIPE).stdout
+        assert output.startswith(b"BEGIN:VCALENDAR\r\n")
+        assert output == client.get("/rgdowntime/ical").data
+
+    def test_changes(self, client: flask.Flask, mocker):
+        assert client.get("/changes").status_code == 400
+        assert client.get("/changes?since=HEAD").status_code == 400
+        assert client.get("/changes?since=0000000000").status_code == 400
+
+        head = git_head_sha(global_data.topology_data_dir)
+        response = client.get("/changes?since=" + head)
+        assert response.status_code == 200
+        assert response.json["since"] == response.json["current"] == head
+        for kind in ["resource_groups", "resources", "downtimes", "vos", "projects"]:
+            assert set(response.json[kind]) == {"added", "modified", "removed"}
+
+        git_resolve_commit = mocker.patch("app.git_resolve_commit")
+        assert client.get("/changes?since=" + head).data == response.data
+        git_resolve_commit.assert_not_called()
+
+        vos_data = global_data.get_vos_data()
+        global_data.vos_data.update(vos_data)
+        assert client.get("/changes?since=" + head).status_code == 503, "the commit of the VO data is unknown"
+        global_data.vos_data.update(vos_data, head)
+
+    def test_lookup_endpoints(self, client: flask.Flask, mocker):
+        all_resources = client.get("/miscresource/json").json
+        resource = next(iter(all_resources.values()))
+
+        response = client.get("/api/resource?fqdn=" + resource["FQDN"].upper())
+        assert response.status_code == 200
+        assert response.json == {name: res for name, res in all_resources.items()
+                                 if res["FQDN"].lower() == resource["FQDN"].lower()}
+        assert client.get("/api/resource").status_code == 400
+        assert client.get("/api/resource?fqdn=nonexistent.example.net").status_code == 404
+
+        all_rgs = client.get("/api/resource_group_summary").json
+        response = client.get("/api/resource_group/" + resource["ResourceGroup"])
+        assert response.status_code == 200
+        assert response.json == all_rgs[resource["ResourceGroup"]]
+        get_tree = mocker.spy(ResourceGroup, "get_tree")
+        assert client.get("/api/resource_group/" + resource["ResourceGroup"]).data == response.data
+        get_tree.assert_not_called()
+        assert client.get("/api/resource_group/nonexistent").status_code == 404
+
+        response = client.get("/api/site/%s/resources" % resource["Site"])
+        assert response.status_code == 200
+        assert response.json == {name: res for name, res in all_resources.items() if res["Site"] == resource["Site"]}
+        assert client.get("/api/site/nonexistent/resources").status_code == 404
+
+        for url in ["/api/resource?fqdn=<svg onload=alert(1)>", "/api/resource_group/<svg onload=alert(1)>",
+                    "/api/site/<svg onload=alert(1)>/resources"]:
+            response = client.get(url)
+            assert response.status_code == 404
+            assert response.mimetype == "text/plain", "the name must not be reflected as HTML"
+
+    def test_filters_from_args(self):
+        with app.test_request_context("/rgsummary/xml?rg=on&rg_1=on&rg_sel[]=5&service=on&service_sel[]=1"):
+            filters = get_filters_from_args(flask.request.args)
+        assert filters.rg_id == frozenset([1, 5])
+        assert filters.service_id == frozenset([1])
+        assert filters.site_id == frozenset()
+
+    def test_filter_indexes(self, mocker):
+        topology = global_data.get_topology()
+        rg = next(rg for rg in topology.rgs.values()
+                  if any(isinstance(res.data.get("VOOwnership"), dict) for res in rg.resources))
+        vo_name = next(iter(next(res.data["VOOwnership"] for res in rg.resources
+                                 if isinstance(res.data.get("VOOwnership"), dict))))
+        filter_args = [
+            {"facility_id": [rg.site.facility.id]},
+            {"site_id": [rg.site.id, 999999]},
+            {"support_center_id": [rg.support_center["ID"]], "grid_type": GRIDTYPE_2},
+            {"rg_id": [rg.id]},
+            {"service_id": [rg.resources[0].services[0]["ID"]]},
+            {"voown_name": [vo_name]},
+            {"grid_type": GRIDTYPE_1},
+            {"facility_id": [rg.site.facility.id], "voown_name": [vo_name], "past_days": -1},
+        ]
+        summaries, downtimes = [], []
+        for args in filter_args:
+            filters = Filters()
+            for attr, value in args.items():
+                setattr(filters, attr, value)
+            summaries.append(topology.get_resource_summary(filters=filters))
+            downtimes.append(topology.get_downtimes(filters=filters))
+        assert all(summary["ResourceSummary"]["ResourceGroup"] for summary in summaries[:2])
+
+        mocker.patch.object(topology, "get_filtered_rg_keys", return_value=None)
+        for args, summary, downtime in zip(filter_args, summaries, downtimes):
+            filters = Filters()
+            for attr, value in args.items():
+                setattr(filters, attr, value)
+            assert topology.get_resource_summary(filters=filters) == summary, args
+            assert topology.get_downtimes(filters=filters) == downtime, args
+
+    def test_conditional_requests(self, client: flask.Flask):
+        response = client.get("/miscsite/json")
+        assert response.status_code == 200
+        assert response.headers["ETag"]
+        assert "Last-Modified" not in response.headers, "the load time differs between processes"
+
+        not_modified = client.get("/miscsite/json", headers={"If-None-Match": response.headers["ETag"]})
+        assert not_modified.status_code == 304
+        assert not not_modified.data
+        assert "max-age=300" in not_modified.headers["Cache-Control"]
+
+        response2 = client.get("/miscsite/json", headers={"If-None-Match": '"some-other-etag"'})
+        assert response2.status_code == 200
+        assert response2.data == response.data
+
+        downtimes = client.get("/rgdowntime/xml")
+        assert downtimes.headers["ETag"]
+
+        # The OSDF config files are polled by every cache and origin
+        for endpoint in ["/cache/Authfile", "/cache/Authfile-public", "/cache/scitokens.conf", "/cache/grid-mapfile",
+                         "/origin/Authfile", "/origin/Authfile-public", "/origin/scitokens.conf", "/origin/grid-mapfile"]:
+            fqdn = "xrootd-local.unl.edu" if endpoint.startswith("/origin") else "stash-cache.osg.chtc.io"
+            url = f"{endpoint}?fqdn={fqdn}"
+            response = client.get(url)
+            assert response.status_code == 200, url
+            assert response.headers["ETag"], url
+            not_modified = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+            assert not_modified.status_code == 304, url
 
     def test_cache_grid_mapfile(self, client: flask.Flask):
         TEST_CACHE = "stash-cache.osg.chtc.io"  # This cache allows cert-based auth
@@ -25,8 +25,11 @@ warnings.filterwarnings(
 )
 
 from app import app, global_data
+from webapp import ldap_data, oasis_managers
 from webapp.common import API_KEY_RE, token_to_apikeyhash
 from webapp.contacts_reader import ContactsData
+from webapp.models import CachedData
+from webapp.oasis_managers import get_oasis_manager_endpoint_info
 
 _TESTCONTACT_YAML = os.path.join(str(os.path.dirname(__file__)), "data", "testcontact.yaml")
 
@@ -287,5 +290,47 @@ class TestApiKeyAuth:
         assert UNKNOWN_TOKEN not in caplog.text
 
 
+class TestOasisManagers:
+
+    def test_ldap_data_is_shared_between_requests(self, mocker: MockerFixture):
+        mocker.patch.object(global_data, "osg_ldap_id_map", CachedData(cache_lifetime=60))
+        mocker.patch.object(global_data, "oasis_managers_info", CachedData(cache_lifetime=60))
+        get_id_map = mocker.patch.object(ldap_data, "get_osg_ldap_id_map", return_value={})
+
+        all_info = get_oasis_manager_endpoint_info(global_data, "*", b"dummy")
+        assert isinstance(all_info, dict)
+        for vo in ["CMS", "NoSuchVO", "*"]:
+            get_oasis_manager_endpoint_info(global_data, vo, b"dummy")
+        get_id_map.assert_called_once()
+
+    def test_updated_when_vos_are_reloaded(self, mocker: MockerFixture):
+        mocker.patch.object(global_data, "osg_ldap_id_map", CachedData(cache_lifetime=60))
+        mocker.patch.object(global_data, "oasis_managers_info", CachedData(cache_lifetime=60))
+        mocker.patch.object(ldap_data, "get_osg_ldap_id_map", return_value={})
+        get_all_managers_info = mocker.spy(oasis_managers, "get_all_managers_info")
+
+        get_oasis_manager_endpoint_info(global_data, "*", b"dummy")
+        get_oasis_manager_endpoint_info(global_data, "*", b"dummy")
+        assert get_all_managers_info.call_count == 1
+        global_data.vos_data.update(global_data.vos_data.data)
+        get_oasis_manager_endpoint_info(global_data, "*", b"dummy")
+        assert get_all_managers_info.call_count == 2
+
+    def test_ldap_failure_returns_503(self, client: FlaskClient, mocker: MockerFixture):
+        mocker.patch("app.default_authorized", True)
+        mocker.patch("app.cilogon_pass", b"dummy")
+        mocker.patch.object(global_data, "osg_ldap_id_map", CachedData(cache_lifetime=60))
+        mocker.patch.object(global_data, "oasis_managers_info", CachedData(cache_lifetime=60))
+        mocker.patch.object(global_data, "strict", False)
+        mocker.patch.object(ldap_data, "get_osg_ldap_id_map", return_value=None)
+
+        response = client.get("/oasis-managers/json?vo=ACCRE")
+        assert response.status_code == 503
+        # VOs without OASIS managers need nothing from LDAP
+        response = client.get("/oasis-managers/json?vo=CMS")
+        assert response.status_code == 200
+        assert response.json == []
+
+
 if __name__ == "__main__":
     pytest.main()
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import yaml
+
+# Rewrites the path so the app can be imported like it normally is
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+from topology_repo import FACILITY, SITE, RG, downtime, git, git_head, write_yaml
+from webapp import changes
+
+
+class TestGetChanges:
+
+    def test_changes(self, data_dir):
+        old_sha = git_head(data_dir)
+        rg_path = os.path.join(data_dir, "topology", FACILITY, SITE, RG + ".yaml")
+        with open(rg_path) as fh:
+            rg = yaml.safe_load(fh)
+        del rg["Resources"]["TEST_TIGER_CACHE"]
+        rg["Resources"]["TEST_NEW_CACHE"] = rg["Resources"]["TEST_STASHCACHE_CACHE"]
+        rg["Resources"]["TEST_STASHCACHE_CACHE"] = dict(rg["Resources"]["TEST_STASHCACHE_CACHE"], Active=False)
+        write_yaml(rg_path, rg)
+        write_yaml(os.path.join(data_dir, "topology", FACILITY, SITE, RG + "_downtime.yaml"),
+                   [downtime(3)])
+        write_yaml(os.path.join(data_dir, "topology", FACILITY, SITE, "SITE.yaml"), {"ID": 10001})
+        write_yaml(os.path.join(data_dir, "projects", "TestProject.yaml"), {"Description": "Test project"})
+        git(data_dir, "add", ".")
+        git(data_dir, "commit", "-q", "-m", "change things")
+        new_sha = git_head(data_dir)
+
+        result = changes.get_changes(data_dir, old_sha, new_sha)
+        assert result["since"] == old_sha and result["current"] == new_sha
+        assert result["resource_groups"] == {"added": [], "modified": [RG], "removed": []}
+        assert result["resources"] == {"added": ["TEST_NEW_CACHE"], "modified": ["TEST_STASHCACHE_CACHE"],
+                                       "removed": ["TEST_TIGER_CACHE"]}
+        assert result["downtimes"] == {"added": [3], "modified": [], "removed": [1]}
+        assert result["projects"] == {"added": ["TestProject"], "modified": [], "removed": []}
+        assert result["vos"] == {"added": [], "modified": [], "removed": []}
+        assert result["other"] == ["topology/%s/%s/SITE.yaml" % (FACILITY, SITE)]
+        assert changes.get_changes(data_dir, old_sha, new_sha) is result
+        assert changes.get_changes(data_dir, new_sha, new_sha)["resources"]["modified"] == []
+        assert changes.oldest_commit(data_dir, frozenset([new_sha, old_sha])) == old_sha
@@ -0,0 +1,190 @@
+import json
+import os
+import sys
+from collections import OrderedDict
+
+import pytest
+import xmltodict
+import yaml
+
+# Rewrites the path so the app can be imported like it normally is
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+from webapp.common import YamlCache, bytes2str, iter_xml, python_executable, to_json_bytes, to_xml, \
+    write_file_atomically
+
+
+def _write_yaml(path, data):
+    with open(path, "w") as fh:
+        yaml.safe_dump(data, fh)
+
+
+class TestYamlCache:
+
+    def test_unchanged_file_is_not_reparsed(self, tmp_path, mocker):
+        path = str(tmp_path / "data.yaml")
+        _write_yaml(path, {"a": [1, 2]})
+        cache = YamlCache()
+        parse = mocker.spy(yaml, "load")
+
+        first = cache.load(path)
+        first["a"].append(3)
+        assert cache.load(path) == {"a": [1, 2]}, "callers should get their own copy of the data"
+        assert parse.call_count == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_changed_file_is_reparsed(self, tmp_path):
+        path = str(tmp_path / "data.yaml")
+        _write_yaml(path, {"a": 1})
+        cache = YamlCache()
+        assert cache.load(path) == {"a": 1}
+        _write_yaml(path, {"a": 12345})
+        assert cache.load(path) == {"a": 12345}
+
+    def test_parse_errors_are_not_cached(self, tmp_path):
+        path = str(tmp_path / "data.yaml")
+        with open(path, "w") as fh:
+            fh.write("a: [1\n")
+        cache = YamlCache()
+        with pytest.raises(yaml.YAMLError):
+            cache.load(path)
+        assert len(cache) == 0
+
+    def test_lru_bound(self, tmp_path):
+        cache = YamlCache(max_entries=2)
+        for i in range(3):
+            path = str(tmp_path / f"{i}.yaml")
+            _write_yaml(path, i)
+            cache.load(path)
+        assert len(cache) == 2
+
+    def test_preload(self, tmp_path, mocker):
+        paths = []
+        for i in range(4):
+            path = str(tmp_path / f"{i}.yaml")
+            _write_yaml(path, {"a": i})
+            paths.append(path)
+        bad_path = str(tmp_path / "bad.yaml")
+        with open(bad_path, "w") as fh:
+            fh.write("a: [1\n")
+        cache = YamlCache()
+
+        assert cache.preload(paths + [bad_path], workers=2) == 4
+        parse = mocker.spy(yaml, "load")
+        assert [cache.load(path) for path in paths] == [{"a": i} for i in range(4)]
+        parse.assert_not_called()
+        with pytest.raises(yaml.YAMLError):
+            cache.load(bad_path)
+        assert cache.preload(paths, workers=2) == 0, "files are already cached"
+
+    def test_preload_under_mod_wsgi(self, tmp_path, mocker):
+        paths = []
+        for i in range(2):
+            path = str(tmp_path / f"{i}.yaml")
+            _write_yaml(path, {"a": i})
+            paths.append(path)
+        mocker.patch("sys.executable", "/usr/sbin/httpd")
+        assert python_executable().startswith(sys.exec_prefix)
+        assert YamlCache().preload(paths, workers=2) == 2
+
+        mocker.patch("sys.exec_prefix", str(tmp_path))
+        assert python_executable() is None
+        assert YamlCache().preload(paths, workers=2) == 0, "the files should be loaded sequentially"
+
+    def test_snapshot(self, tmp_path, mocker):
+        path = str(tmp_path / "data.yaml")
+        snapshot_file = str(tmp_path / "cache" / "yaml.pickle")
+        _write_yaml(path, {"a": 1})
+        cache = YamlCache(snapshot_file=snapshot_file)
+        assert not cache.load_snapshot()
+        cache.load(path)
+        assert cache.save_snapshot()
+        assert not cache.save_snapshot(), "nothing changed since the last save"
+
+        new_cache = YamlCache(snapshot_file=snapshot_file)
+        assert new_cache.load_snapshot()
+        parse = mocker.spy(yaml, "load")
+        assert new_cache.load(path) == {"a": 1}
+        parse.assert_not_called()
+
+
+def test_write_file_atomically(tmp_path):
+    path = str(tmp_path / "subdir" / "file")
+    write_file_atomically(path, lambda fh: fh.write(b"first"), prefix=".test.")
+    with open(path, "rb") as fh:
+        assert fh.read() == b"first"
+
+    def fail(fh):
+        fh.write(b"partial")
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        write_file_atomically(path, fail, prefix=".test.")
+    with open(path, "rb") as fh:
+        assert fh.read() == b"first"
+    assert os.listdir(os.path.dirname(path)) == ["file"], "the temporary file should be removed"
+
+
+class TestToXml:
+
+    DOCUMENT = OrderedDict([
+        ("#comment", ["a comment", None, ""]),
+        ("Root", OrderedDict([
+            ("@quotes", 'say "hi"'), ("@both", "it's \"&<>\n\t"), ("@none", None), ("@bool", True),
+            ("@xmlns", {"": "urn:default", "p": None}),
+            ("#text", "text & <more>"),
+            ("Empty", []),
+            ("Null", None),
+            ("Values", [1, 2.5, False, b"by\xfftes", None, "str", {"#text": ""}, ("a", "b")]),
+            ("#comment", "another comment"),
+            ("Nested", {"Child": {"Leaf": [{"@id": 1}, {"@id": 2, "#text": "two"}]}}),
+        ])),
+    ])
+
+    def test_same_as_xmltodict(self):
+        expected = xmltodict.unparse(self.DOCUMENT, pretty=True, encoding="utf-8")
+        assert to_xml(self.DOCUMENT) == expected
+        chunks = list(iter_xml(self.DOCUMENT, chunk_size=1))
+        assert len(chunks) > 2
+        assert "".join(chunks) == expected
+
+    @pytest.mark.parametrize("document", [
+        {"Root": {}},
+        {"Root": "text"},
+        {"Root": []},
+        {"Root": {"@attr": "only"}},
+    ])
+    def test_root_only_same_as_xmltodict(self, document):
+        assert to_xml(document) == xmltodict.unparse(document, pretty=True, encoding="utf-8")
+
+    @pytest.mark.parametrize("document", [
+        {},
+        {"Root": {}, "Other": {}},
+        {"Root": [{}, {}]},
+        {"Root": {"bad name": 1}},
+        {"Root": {"@bad=attr": 1}},
+    ])
+    def test_invalid(self, document):
+        with pytest.raises(ValueError):
+            to_xml(document)
+
+
+class TestToJson:
+
+    @pytest.mark.parametrize("data", [
+        {"b": [b"bytes", ("tuple", b"\xffinvalid")], "a": {"z": None, "y": 1.5, "x": True}, "c": "\u00e9"},
+        [b"list"],
+    ])
+    def test_same_as_before(self, data):
+        expected = json.dumps(bytes2str(data), sort_keys=True).encode("utf-8", errors="replace")
+        assert to_json_bytes(data) == expected
+
+    def test_bytes_keys(self):
+        data = {b"bytes key": 1, "key": [b"value"]}
+        expected = json.dumps(bytes2str(data), sort_keys=True).encode("utf-8", errors="replace")
+        assert to_json_bytes(data) == expected
+
+    def test_unserializable(self):
+        with pytest.raises(TypeError):
+            to_json_bytes({"a": object()})
@@ -0,0 +1,269 @@
+import copy
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+# Rewrites the path so the app can be imported like it normally is
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+from topology_repo import FACILITY, SITE, RG, downtime, downtime_ids, git, git_head, write_yaml
+from webapp import common, rg_reader
+from webapp.models import CachedData, GlobalData
+
+
+def _in_thread(func):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    return thread, result
+
+
+class TestCachedData:
+
+    def test_single_flight_refresh_serves_stale_data(self):
+        cached = CachedData(data="old", cache_lifetime=60)
+        assert cached.should_update()
+
+        thread, result = _in_thread(cached.should_update)
+        thread.join()
+        assert result == [False], "only one thread should refresh the data"
+        assert cached.data == "old"
+
+        cached.update("new")
+        assert not cached.should_update()
+        cached.force_update = True
+        thread, result = _in_thread(cached.should_update)
+        thread.join()
+        assert result == [True], "the refresh should be available again after update()"
+
+    def test_first_load_waits_for_refresh(self):
+        cached = CachedData(first_load_timeout=30)
+        assert cached.should_update()
+
+        def get():
+            cached.should_update()
+            return cached.data
+
+        thread, result = _in_thread(get)
+        cached.update("data")
+        thread.join()
+        assert result == ["data"]
+
+    def test_first_load_wait_is_bounded(self):
+        cached = CachedData(first_load_timeout=0.01)
+        assert cached.should_update()
+        thread, result = _in_thread(cached.should_update)
+        thread.join()
+        assert result == [False]
+        cached.try_again()
+
+    def test_abandoned_refresh_is_taken_over(self):
+        cached = CachedData(data="old", refresh_timeout=0)
+        assert cached.should_update()
+        thread, result = _in_thread(cached.should_update)
+        thread.join()
+        assert result == [True]
+
+    def test_deepcopy(self):
+        cached = CachedData(data={"a": 1})
+        assert cached.should_update()
+        copied = copy.deepcopy(cached)
+        assert copied.data == {"a": 1} and copied.data is not cached.data
+        thread, result = _in_thread(copied.should_update)
+        thread.join()
+        assert result == [True], "the copy should not inherit the refresh in progress"
+
+
+class TestRefreshAll:
+
+    GETTERS = {
+        "contacts_data": "get_contact_db_data",
+        "comanage_data": "get_comanage_data",
+        "merged_contacts_data": "get_contacts_data",
+        "dn_set": "get_dns",
+        "api_key_set": "get_api_keys",
+        "topology": "get_topology",
+        "vos_data": "get_vos_data",
+        "projects": "get_projects",
+        "mappings": "get_mappings",
+    }
+
+    def _mock_getters(self, global_data, mocker):
+        calls = []
+        for attr, getter in self.GETTERS.items():
+            def get(attr=attr):
+                calls.append(attr)
+                cached = getattr(global_data, attr)
+                if cached.should_update():
+                    cached.update("data")
+            mocker.patch.object(global_data, getter, side_effect=get)
+        mocker.patch.object(global_data, "_update_topology_repo", return_value=True)
+        return calls
+
+    def test_updates_in_dependency_order(self, mocker):
+        global_data = GlobalData({"CONTACT_DATA_DIR": None})
+        calls = self._mock_getters(global_data, mocker)
+
+        global_data.refresh_all()
+        assert calls == list(self.GETTERS)
+        assert calls.index("merged_contacts_data") < calls.index("topology")
+        assert calls.index("vos_data") < calls.index("projects")
+
+        calls.clear()
+        global_data.refresh_all()
+        assert calls == [], "fresh data should not be updated"
+
+        global_data.vos_data.next_update = time.monotonic() + global_data.vos_data.cache_lifetime / 4
+        global_data.refresh_all()
+        assert calls == ["vos_data"], "data should be updated before it expires"
+
+    def test_failed_update_is_retried_later(self, mocker):
+        global_data = GlobalData({"CONTACT_DATA_DIR": None})
+        self._mock_getters(global_data, mocker)
+        mocker.patch.object(global_data, "get_topology", side_effect=RuntimeError("boom"))
+
+        global_data.refresh_all()
+        assert global_data.vos_data.data == "data", "a failure should not stop the other updates"
+        assert global_data.topology.data is None
+        assert global_data.topology.next_update > time.monotonic(), "the retry delay should be set"
+        thread, result = _in_thread(global_data.topology.should_update)
+        thread.join()
+        assert result == [True], "the failed update should not keep the data claimed"
+
+    def test_failed_pull_does_not_stop_the_updates(self, mocker):
+        global_data = GlobalData({"CONTACT_DATA_DIR": None})
+        calls = self._mock_getters(global_data, mocker)
+        mocker.patch.object(global_data, "_update_topology_repo", side_effect=subprocess.TimeoutExpired("git", 1))
+
+        global_data.refresh_all()
+        assert calls == list(self.GETTERS), "a failure should not stop the other updates"
+        assert global_data.topology_repo_stamp.next_update > time.monotonic(), "the retry delay should be set"
+        thread, result = _in_thread(lambda: global_data.topology_repo_stamp.claim_refresh(float("inf")))
+        thread.join()
+        assert result == [True], "the failed pull should not keep the repo claimed"
+
+    def test_claim_is_released_without_an_update(self, mocker):
+        global_data = GlobalData({"CONTACT_DATA_DIR": None})
+        self._mock_getters(global_data, mocker)
+        mocker.patch.object(global_data, "get_topology", return_value=None)
+
+        global_data.refresh_all()
+        assert global_data.topology.data is None
+        thread, result = _in_thread(global_data.topology.should_update)
+        thread.join()
+        assert result == [True], "the update should not stay claimed"
+
+
+def test_global_data_leaves_yaml_cache_alone(tmp_path):
+    max_entries, snapshot_file = common.yaml_cache.max_entries, common.yaml_cache.snapshot_file
+    GlobalData({"CONTACT_DATA_DIR": None, "YAML_CACHE_SIZE": 1, "YAML_CACHE_FILE": str(tmp_path / "yaml.pickle")})
+    assert (common.yaml_cache.max_entries, common.yaml_cache.snapshot_file) == (max_entries, snapshot_file)
+
+
+class TestDataSnapshot:
+
+    def test_snapshot_changes_with_the_data(self, mocker):
+        global_data = GlobalData({"CONTACT_DATA_DIR": None})
+        for getter in ["get_topology", "get_vos_data", "get_projects", "get_mappings", "get_contacts_data"]:
+            mocker.patch.object(global_data, getter)
+        for cached in [global_data.topology, global_data.vos_data, global_data.projects,
+                       global_data.mappings, global_data.merged_contacts_data]:
+            cached.update("data")
+
+        snapshot = global_data.get_snapshot()
+        assert snapshot.get_topology() == "data"
+        assert global_data.get_snapshot() is snapshot, "the snapshot should be reused until the data changes"
+        with pytest.raises(AttributeError):
+            snapshot.topology = "new data"
+
+        global_data.vos_data.update("new data")
+        new_snapshot = global_data.get_snapshot()
+        assert new_snapshot.generation > snapshot.generation
+        assert new_snapshot.get_vos_data() == "new data"
+        assert snapshot.get_vos_data() == "data", "old snapshots should not change"
+
+    def test_snapshot_of_some_datasets(self, mocker):
+        global_data = GlobalData({"CONTACT_DATA_DIR": None})
+        getters = {getter: mocker.patch.object(global_data, getter)
+                   for getter in ["get_topology", "get_vos_data", "get_projects", "get_mappings", "get_contacts_data"]}
+        for cached in [global_data.topology, global_data.vos_data, global_data.projects,
+                       global_data.mappings, global_data.merged_contacts_data]:
+            cached.update("data")
+
+        snapshot = global_data.get_snapshot(["topology", "vos_data"])
+        assert (snapshot.get_topology(), snapshot.get_vos_data(), snapshot.get_projects()) == ("data", "data", None)
+        assert getters["get_topology"].called and getters["get_vos_data"].called
+        for getter in ["get_projects", "get_mappings", "get_contacts_data"]:
+            assert not getters[getter].called, "%s should not be needed" % getter
+
+        global_data.projects.update("new data")
+        assert global_data.get_snapshot(["topology", "vos_data"]) is snapshot, "the projects are not in it"
+        assert global_data.get_snapshot().generation != snapshot.generation
+
+
+class TestDataSnapshotReader:
+
+    def test_data_snapshot_reader(self, data_dir, tmp_path, mocker):
+        config = {"TOPOLOGY_DATA_DIR": data_dir, "CONTACT_DATA_DIR": None,
+                  "DATA_SNAPSHOT_FILE": str(tmp_path / "data.pickle")}
+        reader = GlobalData(dict(config, DATA_SNAPSHOT_ROLE="reader"), strict=True)
+        get_topology = mocker.spy(rg_reader, "get_topology")
+        loader = GlobalData(dict(config), strict=True)
+        loader.refresh_all()
+        get_topology.assert_called_once()
+        assert downtime_ids(reader.get_topology()) == [1]
+
+        write_yaml(os.path.join(data_dir, "topology", FACILITY, SITE, RG + "_downtime.yaml"),
+                   [downtime(1), downtime(3)])
+        git(data_dir, "commit", "-q", "-a", "-m", "add downtime")
+        reader.refresh_all()
+        assert downtime_ids(reader.get_topology()) == [1], "the loader has not reloaded yet"
+        loader.topology.force_update = True
+        loader.refresh_all()
+        reader.refresh_all()
+        assert downtime_ids(reader.get_topology()) == [1], "the other data is still from the old commit"
+        for cached in [loader.vos_data, loader.projects, loader.mappings]:
+            cached.force_update = True
+        loader.refresh_all()
+        reader.refresh_all()
+        assert reader.topology_sha == loader.topology_sha
+        assert downtime_ids(reader.get_topology()) == [1, 3]
+        assert get_topology.call_count == 2, "only the loader should parse the YAML files"
+
+    def test_data_snapshot_reader_fallback(self, data_dir, tmp_path, mocker):
+        config = {"TOPOLOGY_DATA_DIR": data_dir, "CONTACT_DATA_DIR": None,
+                  "DATA_SNAPSHOT_FILE": str(tmp_path / "data.pickle")}
+        reader = GlobalData(dict(config, DATA_SNAPSHOT_ROLE="reader"), strict=True)
+        for cached in [reader.topology, reader.vos_data, reader.projects, reader.mappings]:
+            cached.first_load_timeout = 0
+        get_topology = mocker.spy(rg_reader, "get_topology")
+        assert downtime_ids(reader.get_topology()) == [1], "there is no loader; load the data without it"
+        get_topology.assert_called_once()
+
+        loader = GlobalData(dict(config), strict=True)
+        loader.refresh_all()
+        reader.refresh_all()
+        assert not reader._data_snapshot_fallback, "the file is for the current commit"
+        assert get_topology.call_count == 2, "only the loader should parse the YAML files again"
+
+        write_yaml(os.path.join(data_dir, "topology", FACILITY, SITE, RG + "_downtime.yaml"),
+                   [downtime(1), downtime(3)])
+        git(data_dir, "commit", "-q", "-a", "-m", "add downtime")
+        reader.refresh_all()  # notices the file is out of date
+        reader.refresh_all()  # and reloads the data itself after the timeout
+        assert downtime_ids(reader.get_topology()) == [1, 3]
+        assert reader.topology_sha == git_head(data_dir)
+        assert get_topology.call_count == 3
+
+        for cached in [loader.topology, loader.vos_data, loader.projects, loader.mappings]:
+            cached.force_update = True
+        loader.refresh_all()
+        reader.refresh_all()
+        assert not reader._data_snapshot_fallback, "the loader caught up"
+        assert downtime_ids(reader.get_topology()) == [1, 3]
+        assert get_topology.call_count == 4
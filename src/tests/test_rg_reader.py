@@ -0,0 +1,123 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# Rewrites the path so the app can be imported like it normally is
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+from topology_repo import FACILITY, SITE, RG, downtime, downtime_ids, git, git_head, write_yaml
+from webapp import rg_reader
+from webapp.common import Filters
+from webapp.models import GlobalData
+from webapp.topology import Timeframe
+
+
+class TestUpdateTopology:
+
+    def test_downtime_change_is_applied(self, topology_dir):
+        topology = rg_reader.get_topology(topology_dir)
+        assert downtime_ids(topology) == [1]
+
+        downtime_path = os.path.join(FACILITY, SITE, RG + "_downtime.yaml")
+        write_yaml(os.path.join(topology_dir, downtime_path), [downtime(1), downtime(2)])
+        new_topology = rg_reader.update_topology(topology, topology_dir, [downtime_path])
+
+        assert new_topology is not None and new_topology is not topology
+        assert downtime_ids(new_topology) == [1, 2]
+        assert downtime_ids(topology) == [1], "the old topology should not be modified"
+        assert new_topology.rgs[(SITE, RG)] is topology.rgs[(SITE, RG)]
+
+    def test_deleted_downtime_file(self, topology_dir):
+        topology = rg_reader.get_topology(topology_dir)
+        downtime_path = os.path.join(FACILITY, SITE, RG + "_downtime.yaml")
+        os.unlink(os.path.join(topology_dir, downtime_path))
+
+        new_topology = rg_reader.update_topology(topology, topology_dir, [downtime_path])
+        assert new_topology is not None
+        assert downtime_ids(new_topology) == []
+
+    def test_no_changes_keeps_topology(self, topology_dir):
+        topology = rg_reader.get_topology(topology_dir)
+        assert rg_reader.update_topology(topology, topology_dir, []) is topology
+        assert topology.downtimes_by_timeframe[Timeframe.PAST]
+
+    @pytest.mark.parametrize("changed_path", [
+        os.path.join(FACILITY, SITE, RG + ".yaml"),
+        os.path.join(FACILITY, SITE, "SITE.yaml"),
+        os.path.join(FACILITY, SITE, "otherrg_downtime.yaml"),
+        "services.yaml",
+    ])
+    def test_other_changes_need_full_reload(self, topology_dir, changed_path):
+        topology = rg_reader.get_topology(topology_dir)
+        assert rg_reader.update_topology(topology, topology_dir, [changed_path]) is None
+
+
+class TestGlobalDataIncrementalReload:
+
+    def test_incremental_reload(self, data_dir, mocker):
+        global_data = GlobalData({"TOPOLOGY_DATA_DIR": data_dir, "CONTACT_DATA_DIR": None,
+                                  "TOPOLOGY_INCREMENTAL_RELOAD": True}, strict=True)
+        topology = global_data.get_topology()
+        assert global_data.topology_sha
+        assert downtime_ids(topology) == [1]
+
+        write_yaml(os.path.join(data_dir, "topology", FACILITY, SITE, RG + "_downtime.yaml"),
+                   [downtime(1), downtime(3)])
+        git(data_dir, "commit", "-q", "-a", "-m", "add downtime")
+
+        get_topology = mocker.spy(rg_reader, "get_topology")
+        global_data.update_topology()
+        new_topology = global_data.get_topology()
+        get_topology.assert_not_called()
+        assert downtime_ids(new_topology) == [1, 3]
+        assert new_topology.rgs[(SITE, RG)] is topology.rgs[(SITE, RG)]
+
+        with open(os.path.join(data_dir, "topology", FACILITY, SITE, RG + ".yaml"), "a") as fh:
+            fh.write("\n# a comment\n")
+        git(data_dir, "commit", "-q", "-a", "-m", "edit RG")
+        global_data.update_topology()
+        get_topology.assert_called_once()
+        assert global_data.get_topology().rgs[(SITE, RG)] is not topology.rgs[(SITE, RG)]
+
+    def test_unrelated_commit_keeps_topology(self, data_dir):
+        global_data = GlobalData({"TOPOLOGY_DATA_DIR": data_dir, "CONTACT_DATA_DIR": None,
+                                  "TOPOLOGY_INCREMENTAL_RELOAD": True}, strict=True)
+        topology = global_data.get_topology()
+        generation = global_data.topology.generation
+
+        write_yaml(os.path.join(data_dir, "projects", "_CAMPUS_GRIDS.yaml"), {"Foo": None})
+        git(data_dir, "commit", "-q", "-a", "-m", "edit projects")
+        global_data.update_topology()
+        assert global_data.get_topology() is topology
+        assert global_data.topology.generation == generation
+        assert global_data.topology.commit == git_head(data_dir)
+
+    def test_incremental_reload_matches_full_load(self, data_dir):
+        site_dir = os.path.join(data_dir, "topology", FACILITY, SITE)
+        shutil.copy(os.path.join(site_dir, RG + ".yaml"), os.path.join(site_dir, "testrg2.yaml"))
+        write_yaml(os.path.join(site_dir, "testrg2_downtime.yaml"), [downtime(2)])
+        git(data_dir, "add", ".")
+        git(data_dir, "commit", "-q", "-m", "add RG")
+        global_data = GlobalData({"TOPOLOGY_DATA_DIR": data_dir, "CONTACT_DATA_DIR": None,
+                                  "TOPOLOGY_INCREMENTAL_RELOAD": True}, strict=True)
+        topology = global_data.get_topology()
+        contacts = topology.common_data.contacts
+
+        # The downtimes of the first RG would otherwise end up after the other RG's
+        _, first_rg = next(iter(topology.rgs))
+        write_yaml(os.path.join(site_dir, first_rg + "_downtime.yaml"), [downtime(4), downtime(3)])
+        git(data_dir, "commit", "-q", "-a", "-m", "add downtime")
+        global_data.update_topology()
+        new_topology = global_data.get_topology()
+        assert new_topology.rgs is topology.rgs, "should have been reloaded incrementally"
+        assert topology.common_data.contacts is contacts
+
+        full_topology = rg_reader.get_topology(os.path.join(data_dir, "topology"), contacts, strict=True)
+        assert [dt.id for dt in new_topology.downtime_index.downtimes] == \
+               [dt.id for dt in full_topology.downtime_index.downtimes]
+        filters = Filters()
+        filters.past_days = -1
+        assert new_topology.get_downtimes(filters=filters) == full_topology.get_downtimes(filters=filters)
@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+# Rewrites the path so the app can be imported like it normally is
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+from topology_repo import FACILITY, SITE, RG, downtime, downtime_ids, git, git_head, write_yaml
+from webapp import rg_reader
+from webapp.common import next_serial
+from webapp.models import GlobalData
+
+
+class TestDataSnapshotFile:
+
+    def test_data_snapshot_file(self, data_dir, tmp_path, mocker):
+        config = {"TOPOLOGY_DATA_DIR": data_dir, "CONTACT_DATA_DIR": None,
+                  "DATA_SNAPSHOT_FILE": str(tmp_path / "data.pickle")}
+        GlobalData(dict(config), strict=True).refresh_all()
+        assert os.path.exists(config["DATA_SNAPSHOT_FILE"])
+
+        get_topology = mocker.spy(rg_reader, "get_topology")
+        global_data = GlobalData(dict(config), strict=True)
+        serial = next_serial()
+        assert downtime_ids(global_data.get_topology()) == [1]
+        assert global_data.get_topology().serial > serial, "serials from another process may be reused"
+        assert global_data.get_vos_data().serial > serial
+        assert global_data.get_topology().downtime_index.partition().serial > serial
+        assert global_data.get_mappings().nsfscience
+        assert global_data.get_topology().common_data.contacts is global_data.get_contacts_data()
+        get_topology.assert_not_called()
+
+        write_yaml(os.path.join(data_dir, "topology", FACILITY, SITE, RG + "_downtime.yaml"),
+                   [downtime(1), downtime(3)])
+        git(data_dir, "commit", "-q", "-a", "-m", "add downtime")
+        global_data = GlobalData(dict(config), strict=True)
+        assert downtime_ids(global_data.get_topology()) == [1, 3], "the snapshot is for an older commit"
+        get_topology.assert_called_once()
+
+    def test_data_snapshot_file_after_pull(self, data_dir, tmp_path):
+        branch = subprocess.run(["git", "-C", data_dir, "rev-parse", "--abbrev-ref", "HEAD"], check=True,
+                                stdout=subprocess.PIPE, encoding="ascii").stdout.strip()
+        config = {"TOPOLOGY_DATA_DIR": str(tmp_path / "checkout"), "TOPOLOGY_DATA_REPO": data_dir,
+                  "TOPOLOGY_DATA_BRANCH": branch, "NO_GIT": False, "CONTACT_DATA_DIR": None,
+                  "DATA_SNAPSHOT_FILE": str(tmp_path / "data.pickle")}
+        GlobalData(dict(config), strict=True).refresh_all()
+        assert os.path.exists(config["DATA_SNAPSHOT_FILE"])
+
+        write_yaml(os.path.join(data_dir, "topology", FACILITY, SITE, RG + "_downtime.yaml"),
+                   [downtime(1), downtime(3)])
+        git(data_dir, "commit", "-q", "-a", "-m", "add downtime")
+        global_data = GlobalData(dict(config), strict=True)
+        assert downtime_ids(global_data.get_topology()) == [1, 3], "the snapshot is for the commit before the pull"
+        assert global_data.topology_sha == git_head(data_dir)
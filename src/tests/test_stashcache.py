@@ -184,6 +184,39 @@ class TestStashcache:
                 assert False, f'Unexpected text "{line}".\nFull text:\n{text}\n'
         assert num_mappings > 0, f"Unexpected error parsing grid-mapfile (no mappings found).\nFull text:\n{text}\n"
 
+    def test_generated_files_are_reused_until_data_changes(self, test_global_data, mocker):
+        for_cache = mocker.spy(stashcache._IdNamespaceData, "for_cache")
+        authfile = stashcache.generate_cache_authfile(test_global_data, I2_TEST_CACHE, suppress_errors=False)
+        public_authfile = stashcache.generate_public_cache_authfile(test_global_data, I2_TEST_CACHE,
+                                                                    suppress_errors=False)
+        assert stashcache.generate_cache_authfile(test_global_data, I2_TEST_CACHE.upper(),
+                                                  suppress_errors=False) == authfile
+        assert for_cache.call_count == 1, "namespace data should be shared by all files for a cache"
+
+        testvo2 = load_yaml_file(topdir + "/tests/data/testvo.yaml")
+        testvo2["ID"] = None
+        testvo2["DataFederations"]["StashCache"]["Namespaces"] = [
+            {"Path": "/testvo2/PUBLIC", "Authorizations": ["PUBLIC"],
+             "AllowedOrigins": ["TEST_STASHCACHE_ORIGIN"], "AllowedCaches": ["ANY"]}
+        ]
+        test_global_data.get_vos_data().add_vo("testvo2", testvo2)
+        new_public_authfile = stashcache.generate_public_cache_authfile(test_global_data, I2_TEST_CACHE,
+                                                                        suppress_errors=False)
+        assert for_cache.call_count == 2
+        assert "/testvo2/PUBLIC" in new_public_authfile and "/testvo2/PUBLIC" not in public_authfile
+
+    def test_resources_stashcache_files(self, test_global_data, mocker):
+        resources_files = stashcache.get_resources_stashcache_files(test_global_data)
+        cache = next(resource for resource in stashcache.get_cache_resources(test_global_data.get_topology())
+                     if "CacheAuthfile" in resources_files.get(resource.name, {}))
+        assert resources_files[cache.name] == cache.get_stashcache_files(test_global_data)
+        assert resources_files[cache.name]["CacheAuthfile"] == \
+            stashcache.generate_cache_authfile(test_global_data, cache.fqdn, suppress_errors=False)
+
+        generate_cache_authfile = mocker.spy(stashcache, "generate_cache_authfile")
+        assert stashcache.get_resources_stashcache_files(test_global_data) is resources_files
+        generate_cache_authfile.assert_not_called()
+
 
 class TestNamespaces:
     @pytest.fixture
@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+# Rewrites the path so the app can be imported like it normally is
+topdir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(topdir)
+
+from topology_repo import FACILITY, SITE, RG, downtime, write_yaml
+from webapp import rg_reader
+from webapp.topology import Downtime, Timeframe
+
+
+class TestDowntimeIndex:
+
+    def test_timeframes_follow_the_current_time(self, topology_dir):
+        write_yaml(os.path.join(topology_dir, FACILITY, SITE, RG + "_downtime.yaml"), [
+            downtime(1),
+            downtime(2, StartTime="Jan 3, 2020 00:00 +0000", EndTime="Jan 4, 2020 00:00 +0000"),
+        ])
+        topology = rg_reader.get_topology(topology_dir)
+        index = topology.downtime_index
+
+        def timeframes(current_time):
+            partition = index.partition(current_time)
+            return {tf: [dt.id for dt in dts] for tf, dts in partition.by_timeframe.items()}
+
+        dec31 = datetime(2019, 12, 31, tzinfo=timezone.utc)
+        partition = index.partition(dec31)
+        assert timeframes(dec31) == {Timeframe.PAST: [], Timeframe.PRESENT: [], Timeframe.FUTURE: [1, 2]}
+        assert index.partition(datetime(2019, 12, 31, 12, tzinfo=timezone.utc)) is partition, \
+            "nothing started or ended, so the partition should be reused"
+
+        jan1 = datetime(2020, 1, 1, 12, tzinfo=timezone.utc)
+        assert timeframes(jan1) == {Timeframe.PAST: [], Timeframe.PRESENT: [1], Timeframe.FUTURE: [2]}
+        assert [dt.id for dt in index.partition(jan1).present_by_resource["TEST_STASHCACHE_CACHE"]] == [1]
+
+        jan5 = datetime(2020, 1, 5, tzinfo=timezone.utc)
+        assert timeframes(jan5) == {Timeframe.PAST: [1, 2], Timeframe.PRESENT: [], Timeframe.FUTURE: []}
+        partition = index.partition(jan5)
+        jan3 = datetime(2020, 1, 3, tzinfo=timezone.utc)
+        assert [dt.id for dt in partition.get(Timeframe.PAST, ended_after=jan3)] == [2]
+        assert [dt.id for dt in partition.get(Timeframe.PAST, {(SITE, RG)}, ended_after=jan3)] == [2]
+        assert [dt.id for dt in partition.get(Timeframe.PAST, {(SITE, "otherrg")}, ended_after=jan3)] == []
+        assert [dt.id for dt in partition.get(Timeframe.PAST, {(SITE, RG)})] == [1, 2]
+        assert topology.get_present_downtimes("TEST_STASHCACHE_CACHE") == []
+
+
+class TestDowntimeParsetime:
+
+    @pytest.mark.parametrize("time_str", [
+        "Mar 7, 2017 03:00 -0500",
+        "mar 07, 2017 3:00 +0530",
+        "Dec 31, 2019 23:30 -0100",
+        "Feb 29, 2020 00:00 +0000",
+        "Jan 1, 2020 00:00 UTC",
+        "Jan 1, 2020 00:00",
+        "Mar 7, 2017 03:00 AM UTC",
+        "Jan  1, 2020 00:00 +00:00",
+    ])
+    def test_same_as_strptime(self, time_str):
+        for fmt in [Downtime.PREFERRED_TIME_FMT, "%b %d, %Y %H:%M UTC", "%b %d, %Y %H:%M", "%b %d, %Y %H:%M %p UTC"]:
+            try:
+                expected = datetime.strptime(time_str, fmt)
+                break
+            except ValueError:
+                pass
+        if expected.tzinfo:
+            expected = expected.astimezone(timezone.utc)
+        else:
+            expected = expected.replace(tzinfo=timezone.utc)
+        parsed = Downtime.parsetime(time_str)
+        assert parsed == expected and parsed.tzinfo == timezone.utc
+
+    @pytest.mark.parametrize("time_str", ["Feb 29, 2019 00:00 +0000", "Jan 1, 2020 24:00 +0000",
+                                          "Jan 1, 2020 00:00 +2400", "Foo 1, 2020 00:00 +0000"])
+    def test_invalid_times(self, time_str):
+        with pytest.raises(ValueError):
+            Downtime.parsetime(time_str)
@@ -0,0 +1,72 @@
+"""Helpers to create a minimal topology data repo for the tests (see conftest.py)"""
+import os
+import shutil
+import subprocess
+
+import yaml
+
+
+FACILITY = "Test Facility"
+SITE = "TestSite"
+RG = "testrg"
+DOWNTIME_TEMPLATE = {
+    "Class": "SCHEDULED",
+    "Description": "Test downtime",
+    "Severity": "Outage",
+    "StartTime": "Jan 1, 2020 00:00 +0000",
+    "EndTime": "Jan 2, 2020 00:00 +0000",
+    "CreatedTime": "Dec 1, 2019 00:00 +0000",
+    "ResourceName": "TEST_STASHCACHE_CACHE",
+    "Services": ["XRootD cache server"],
+}
+
+_srcdir = os.path.join(os.path.dirname(__file__), "..")
+
+
+def downtime(id_, **kwargs):
+    dt = dict(DOWNTIME_TEMPLATE, ID=id_)
+    dt.update(kwargs)
+    return dt
+
+
+def write_yaml(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fh:
+        yaml.safe_dump(data, fh)
+
+
+def downtime_ids(topology):
+    return sorted(dt.id for dts in topology.downtimes_by_timeframe.values() for dt in dts)
+
+
+def make_topology_dir(root: str) -> str:
+    """Create a topology tree containing a single RG with a downtime in `root`"""
+    write_yaml(os.path.join(root, "services.yaml"), {"XRootD cache server": 160, "XRootD origin server": 161})
+    write_yaml(os.path.join(root, "support-centers.yaml"), {"Self Supported": {"ID": 115}})
+    write_yaml(os.path.join(root, FACILITY, "FACILITY.yaml"), {"ID": 10000})
+    write_yaml(os.path.join(root, FACILITY, SITE, "SITE.yaml"), {"ID": 10000})
+    shutil.copy(os.path.join(_srcdir, "tests", "data", "testrg.yaml"), os.path.join(root, FACILITY, SITE, RG + ".yaml"))
+    write_yaml(os.path.join(root, FACILITY, SITE, RG + "_downtime.yaml"), [downtime(1)])
+    return root
+
+
+def make_data_repo(topology_dir: str) -> str:
+    """Turn the parent of `topology_dir` into a git repo with the rest of the data GlobalData needs"""
+    data_dir = os.path.dirname(topology_dir)
+    write_yaml(os.path.join(data_dir, "virtual-organizations", "REPORTING_GROUPS.yaml"), {})
+    write_yaml(os.path.join(data_dir, "projects", "_CAMPUS_GRIDS.yaml"), {})
+    shutil.copytree(os.path.join(_srcdir, "..", "mappings"), os.path.join(data_dir, "mappings"))
+    git(data_dir, "init", "-q")
+    git(data_dir, "add", ".")
+    git(data_dir, "commit", "-q", "-m", "initial")
+    return data_dir
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-C", repo, "-c", "user.name=test", "-c", "user.email=test@example.net"] + list(args),
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def git_head(repo):
+    return subprocess.run(["git", "-C", repo, "rev-parse", "HEAD"], check=True,
+                          stdout=subprocess.PIPE, encoding="ascii").stdout.strip()
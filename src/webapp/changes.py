@@ -0,0 +1,154 @@
+"""What changed in the topology data between two commits of the topology repo,
+for the /changes endpoint.
+
+Resource groups and resources are identified by name, downtimes by ID, and
+VOs and projects by the name of their file.  Changes to other data files
+(e.g. facilities, sites, or the list of services) are listed by path.
+"""
+from collections import OrderedDict
+import functools
+import logging
+import re
+import threading
+from typing import AbstractSet, Dict, Iterable, Optional
+
+import yaml
+
+from .common import PreJSON, SafeLoader, git_changed_paths_with_status, git_file_contents, git_merge_base
+
+
+log = logging.getLogger(__name__)
+
+COMMIT_RE = re.compile(r"[0-9a-fA-F]{7,40}")
+KINDS = ["resource_groups", "resources", "downtimes", "vos", "projects"]
+# The GlobalData datasets that changes to the KINDS show up in
+DATASETS = ("topology", "vos_data", "projects")
+
+# Commits don't change, so the changes between two of them are kept
+_CACHE_SIZE = 64
+_cache = OrderedDict()  # type: OrderedDict[tuple, PreJSON]
+_cache_lock = threading.Lock()
+
+
+def _kind_and_name(path: str):
+    """Return the kind of data in the file at `path` and its name, or (None, None) for other files"""
+    parts = path.split("/")
+    if not parts[-1].endswith(".yaml"):
+        return None, None
+    stem = parts[-1][:-len(".yaml")]
+    if parts[0] == "topology" and len(parts) == 4 and stem != "SITE":
+        if stem.endswith("_downtime"):
+            return "downtimes", stem[:-len("_downtime")]
+        return "resource_groups", stem
+    elif parts[0] == "virtual-organizations" and len(parts) == 2 and stem != "REPORTING_GROUPS":
+        return "vos", stem
+    elif parts[0] == "projects" and len(parts) == 2 and not stem.startswith("_"):
+        return "projects", stem
+    return None, None
+
+
+def _compare(changes: Dict, old: Dict, new: Dict):
+    changes["added"].update(new.keys() - old.keys())
+    changes["removed"].update(old.keys() - new.keys())
+    changes["modified"].update(key for key in old.keys() & new.keys() if old[key] != new[key])
+
+
+def _sorted(items: Iterable) -> list:
+    try:
+        return sorted(items)
+    except TypeError:  # e.g. a mix of int and str downtime IDs
+        return sorted(items, key=str)
+
+
+@functools.lru_cache(maxsize=16)
+def oldest_commit(data_dir: str, shas: AbstractSet[str]) -> Optional[str]:
+    """Return the one of the commits `shas` that the others descend from, or None if there is none"""
+    if len(shas) == 1:
+        return next(iter(shas))
+    base = git_merge_base(data_dir, sorted(shas))
+    return base if base in shas else None
+
+
+def get_cached_changes(data_dir: str, old_sha: str, new_sha: str) -> Optional[PreJSON]:
+    """Return the result of get_changes() for these arguments if it is cached, or None"""
+    key = (data_dir, old_sha, new_sha)
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+        return result
+
+
+def get_changes(data_dir: str, old_sha: str, new_sha: str) -> Optional[PreJSON]:
+    """Return the resource groups, resources, downtimes, VOs and projects that were
+    added, modified or removed between the commits `old_sha` and `new_sha` of the
+    topology repo checked out in `data_dir`, and the paths of the other data files
+    that changed.  Returns None if git failed.
+
+    The result is shared by all callers with the same arguments; do not modify it.
+    """
+    result = get_cached_changes(data_dir, old_sha, new_sha)
+    if result is not None:
+        return result
+    result = _get_changes(data_dir, old_sha, new_sha)
+    if result is not None:
+        with _cache_lock:
+            _cache[(data_dir, old_sha, new_sha)] = result
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+    return result
+
+
+def _get_changes(data_dir: str, old_sha: str, new_sha: str) -> Optional[PreJSON]:
+    changed_paths = git_changed_paths_with_status(data_dir, old_sha, new_sha)
+    if changed_paths is None:
+        return None
+
+    paths_by_kind = {kind: [] for kind in KINDS}
+    other_paths = set()
+    for _, path in changed_paths:
+        kind, name = _kind_and_name(path)
+        if kind:
+            paths_by_kind[kind].append((path, name))
+        elif path.endswith(".yaml") and path.split("/")[0] in ("topology", "virtual-organizations", "projects"):
+            other_paths.add(path)
+
+    all_paths = [path for paths in paths_by_kind.values() for path, _ in paths]
+    old_files = git_file_contents(data_dir, old_sha, all_paths)
+    new_files = git_file_contents(data_dir, new_sha, all_paths)
+    if old_files is None or new_files is None:
+        return None
+
+    changes = {kind: {"added": set(), "modified": set(), "removed": set()} for kind in KINDS}
+    for kind, paths in paths_by_kind.items():
+        for path, name in paths:
+            try:
+                old = yaml.load(old_files[path] or b"", Loader=SafeLoader)
+                new = yaml.load(new_files[path] or b"", Loader=SafeLoader)
+            except yaml.YAMLError as e:
+                log.debug("Unable to parse %s: %s", path, e)
+                other_paths.add(path)
+                continue
+            if kind == "downtimes":
+                _compare(changes["downtimes"],
+                         {dt.get("ID"): dt for dt in old if isinstance(dt, dict)} if isinstance(old, list) else {},
+                         {dt.get("ID"): dt for dt in new if isinstance(dt, dict)} if isinstance(new, list) else {})
+                continue
+            _compare(changes[kind], {name: old} if old else {}, {name: new} if new else {})
+            if kind == "resource_groups":
+                old_resources = old.get("Resources") if isinstance(old, dict) else None
+                new_resources = new.get("Resources") if isinstance(new, dict) else None
+                _compare(changes["resources"],
+                         old_resources if isinstance(old_resources, dict) else {},
+                         new_resources if isinstance(new_resources, dict) else {})
+
+    result = {"since": old_sha, "current": new_sha}
+    for kind in KINDS:
+        # e.g. a resource that moved to a different RG
+        moved = changes[kind]["added"] & changes[kind]["removed"]
+        changes[kind]["added"] -= moved
+        changes[kind]["removed"] -= moved
+        changes[kind]["modified"] |= moved
+        result[kind] = {change: _sorted(names) for change, names in changes[kind].items()}
+    result["other"] = sorted(other_paths)
+    return result
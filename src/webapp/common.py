@@ -1,17 +1,22 @@
 from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from logging import getLogger
 import hashlib
+import itertools
 import json
+import multiprocessing
 import os
+import pickle
 import re
 import subprocess
 import sys
-from typing import Any, Dict, List, Union, AnyStr, NewType, TypeVar
+import tempfile
+import threading
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union, AnyStr, NewType, TypeVar
 from functools import wraps
 
 log = getLogger(__name__)
 
-import xmltodict
 import yaml
 import csv
 from io import StringIO
@@ -53,7 +58,14 @@ class Filters(object):
         self.has_wlcg = None
 
     def populate_voown_name(self, vo_id_to_name: Dict):
-        self.voown_name = [vo_id_to_name.get(i, "") for i in self.voown_id]
+        self.voown_name = frozenset(vo_id_to_name.get(i, "") for i in self.voown_id)
+
+    def cache_key(self) -> Tuple:
+        """A hashable key of the filter settings; filters with the same key select the same data.
+        voown_name is left out since it follows from voown_id (and the VO data).
+        """
+        return tuple(frozenset(v) if isinstance(v, (list, set)) else v
+                     for k, v in sorted(vars(self).items()) if k != "voown_name")
 
 
 class NamespacesFilters:
@@ -198,12 +210,190 @@ def order_dict(value: Dict, ordering: List, ignore_missing=False) -> OrderedDict
     return new_value
 
 
+# The XML writer below produces the same documents as
+# xmltodict.unparse(data, pretty=True, encoding="utf-8") without going through SAX events,
+# and can yield the document in chunks.
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="utf-8"?>\n'
+_XML_COMMENT_KEY = "#comment"
+_XML_TEXT_KEY = "#text"
+_valid_xml_names = set()
+
+
+def _check_xml_name(name, kind: str):
+    if name in _valid_xml_names:
+        return
+    if (not isinstance(name, str) or name.startswith(("?", "!"))
+            or any(c in name for c in "<>/\"'=") or any(c.isspace() for c in name)):
+        raise ValueError("Invalid XML %s name: %r" % (kind, name))
+    _valid_xml_names.add(name)
+
+
+def _xml_str(value) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace(">", "&gt;").replace("<", "&lt;")
+
+
+def _xml_quoteattr(text: str) -> str:
+    text = _xml_escape(text).replace("\n", "&#10;").replace("\r", "&#13;").replace("\t", "&#9;")
+    if '"' not in text:
+        return '"%s"' % text
+    if "'" not in text:
+        return "'%s'" % text
+    return '"%s"' % text.replace('"', "&quot;")
+
+
+def _xml_items(value):
+    """The values of the elements for one key (a list of values makes one element each)"""
+    if not hasattr(value, "__iter__") or isinstance(value, (str, bytes, bytearray, memoryview, dict)):
+        return [value]
+    return value
+
+
+def _emit_xml_comments(value, depth: int, out: List[str]):
+    for text in (value if isinstance(value, list) else [value]):
+        if text is None:
+            continue
+        if isinstance(text, bytes):
+            text = text.decode("utf-8")
+        text = _xml_str(text)
+        if not text:
+            continue
+        if "--" in text or text.endswith("-"):
+            raise ValueError("Invalid XML comment: %r" % text)
+        out.append("\t" * depth + "<!--" + _xml_escape(text) + "-->\n")
+
+
+def _emit_xml(key, value, depth: int, out: List[str]):
+    if key == _XML_COMMENT_KEY:
+        _emit_xml_comments(value, depth, out)
+        return
+    _check_xml_name(key, "element")
+    for item in _xml_items(value):
+        _emit_xml_element(key, item, depth, out)
+
+
+def _emit_xml_element(key: str, value, depth: int, out: List[str]):
+    """Append the XML for one element to `out`"""
+    if value is None:
+        value = {}
+    elif not isinstance(value, (dict, str)):
+        value = _xml_str(value)
+    if isinstance(value, str):
+        value = {_XML_TEXT_KEY: value}
+    text = None
+    attrs = {}
+    children = []
+    for child_key, child_value in value.items():
+        if child_key == _XML_TEXT_KEY:
+            text = None if child_value is None else _xml_str(child_value)
+        elif isinstance(child_key, str) and child_key.startswith("@"):
+            if child_key == "@xmlns" and isinstance(child_value, dict):
+                for prefix, uri in child_value.items():
+                    _check_xml_name(prefix, "attribute")
+                    attrs["xmlns:" + prefix if prefix else "xmlns"] = "" if uri is None else _xml_str(uri)
+            else:
+                name = child_key[1:]
+                _check_xml_name(name, "attribute")
+                attrs[name] = "" if child_value is None else _xml_str(child_value)
+        elif not (isinstance(child_value, list) and not child_value):
+            children.append((child_key, child_value))
+
+    indent = "\t" * depth
+    out.append(indent + "<" + key)
+    for name, attr_value in attrs.items():
+        out.append(" %s=%s" % (name, _xml_quoteattr(attr_value)))
+    out.append(">\n" if children else ">")
+    for child_key, child_value in children:
+        _emit_xml(child_key, child_value, depth + 1, out)
+    if text:
+        out.append(_xml_escape(text))
+    if children:
+        out.append(indent)
+    out.append("</%s>\n" % key if depth else "</%s>" % key)
+
+
+def iter_xml(data: Dict, chunk_size=64 * 1024) -> Iterator[str]:
+    """Yield the pretty-printed XML document for `data` (a dict with a single root
+    element, in the format used by xmltodict) in chunks of about `chunk_size` characters.
+    """
+    roots = [(key, value) for key, value in data.items() if key != _XML_COMMENT_KEY]
+    if len(roots) != 1:
+        raise ValueError("Document must have exactly one root.")
+    out = [_XML_DECLARATION]
+    size = 0
+    for key, value in data.items():
+        if key == _XML_COMMENT_KEY:
+            _emit_xml_comments(value, 0, out)
+            continue
+        _check_xml_name(key, "element")
+        items = _xml_items(value)
+        if not isinstance(items, list):
+            items = list(items)
+        if len(items) > 1:
+            raise ValueError("document with multiple roots")
+        if not items:
+            continue
+        root = items[0]
+        if not isinstance(root, dict):
+            _emit_xml_element(key, root, 0, out)
+            continue
+        # Write the root element's children one at a time so the document can be
+        # sent before all of it is generated
+        attrs_and_text = {k: v for k, v in root.items() if k == _XML_TEXT_KEY or
+                          (isinstance(k, str) and k.startswith("@"))}
+        children = [(k, v) for k, v in root.items() if k not in attrs_and_text and
+                    not (isinstance(v, list) and not v)]
+        if not children:
+            _emit_xml_element(key, root, 0, out)
+            continue
+        # Get the start tag from an element without children or text: [start tag..., ">", end tag]
+        start = []
+        _emit_xml_element(key, {k: v for k, v in attrs_and_text.items() if k != _XML_TEXT_KEY}, 0, start)
+        out.extend(start[:-2])
+        out.append(">\n")
+        for child_key, child_value in children:
+            if child_key == _XML_COMMENT_KEY:
+                _emit_xml_comments(child_value, 1, out)
+                continue
+            _check_xml_name(child_key, "element")
+            for item in _xml_items(child_value):
+                start = len(out)
+                _emit_xml_element(child_key, item, 1, out)
+                size += sum(len(piece) for piece in out[start:])
+                if size >= chunk_size:
+                    yield "".join(out)
+                    out = []
+                    size = 0
+        text = root.get(_XML_TEXT_KEY)
+        if text is not None:
+            text = _xml_str(text)
+            if text:
+                out.append(_xml_escape(text))
+        out.append("</%s>" % key)
+    yield "".join(out)
+
+
+def iter_xml_bytes(data: Dict, chunk_size=64 * 1024) -> Iterator[bytes]:
+    for chunk in iter_xml(data, chunk_size):
+        yield chunk.encode("utf-8", errors="replace")
+
+
 def to_xml(data) -> str:
-    return xmltodict.unparse(data, pretty=True, encoding="utf-8")
+    return "".join(iter_xml(data))
 
 
 def to_xml_bytes(data) -> bytes:
-    return to_xml(data).encode("utf-8", errors="replace")
+    return b"".join(iter_xml_bytes(data))
 
 
 # bytes cannot be encoded to json in python3
@@ -218,8 +408,22 @@ def bytes2str(o):
         return o
 
 
+def _json_default(o):
+    if isinstance(o, bytes):
+        return o.decode(errors='ignore')
+    raise TypeError(f"Object of type {o.__class__.__name__} is not JSON serializable")
+
+
+# Same output as json.dumps(bytes2str(data), sort_keys=True), without copying the data first
+_json_encoder = json.JSONEncoder(sort_keys=True, default=_json_default)
+
+
 def to_json(data: PreJSON) -> str:
-    return json.dumps(bytes2str(data), sort_keys=True)
+    try:
+        return _json_encoder.encode(data)
+    except TypeError:
+        # The default hook is not used for dict keys, so bytes keys need the copy
+        return json.dumps(bytes2str(data), sort_keys=True)
 
 
 def to_json_bytes(data: PreJSON) -> bytes:
@@ -282,6 +486,97 @@ def run_git_cmd(cmd: List, dir=None, git_dir=None, ssh_key=None) -> bool:
     return True
 
 
+def get_git_output(cmd: List, dir: str) -> Optional[str]:
+    """
+    Run a read-only git command inside the work tree `dir` and return its
+    standard output, or None if git failed (e.g. `dir` is not in a git repo).
+    """
+    git_result = subprocess.run(["git", "-C", dir] + cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                encoding="utf-8", errors="surrogateescape")
+    if git_result.returncode != 0:
+        log.debug("Git failed:\nCommand was %s\nOutput was:\n%s", cmd, git_result.stderr)
+        return None
+    return git_result.stdout
+
+
+def git_head_sha(dir: str) -> Optional[str]:
+    """Return the commit hash of HEAD in the git work tree `dir`, or None if unavailable."""
+    out = get_git_output(["rev-parse", "--verify", "HEAD"], dir)
+    return out.strip() if out else None
+
+
+def git_changed_paths(dir: str, old_sha: str, new_sha: str) -> Optional[List[str]]:
+    """
+    Return the paths (relative to `dir`) of the files under `dir` that differ
+    between the commits `old_sha` and `new_sha`, or None if git failed.
+    A renamed file is reported as both its old and its new path.
+    """
+    out = get_git_output(["diff", "--name-only", "--relative", "--no-renames", "-z", old_sha, new_sha, "--"], dir)
+    if out is None:
+        return None
+    return [path for path in out.split("\0") if path]
+
+
+def git_resolve_commit(dir: str, rev: str) -> Optional[str]:
+    """Return the full hash of the commit `rev` in the git work tree `dir`, or None if there is no such commit."""
+    out = get_git_output(["rev-parse", "--verify", "--quiet", rev + "^{commit}"], dir)
+    return out.strip() if out else None
+
+
+def git_merge_base(dir: str, shas: List[str]) -> Optional[str]:
+    """Return the best common ancestor of the commits `shas` in the git work tree `dir`,
+    or None if they have none or git failed."""
+    out = get_git_output(["merge-base", "--octopus"] + shas, dir)
+    return out.strip() if out else None
+
+
+def git_changed_paths_with_status(dir: str, old_sha: str, new_sha: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    Like git_changed_paths(), but return (status, path) pairs, where the status is
+    "A" (added), "D" (deleted) or "M" (modified).  A renamed file is reported as a
+    deletion of its old path and an addition of its new path.
+    """
+    out = get_git_output(["diff", "--name-status", "--relative", "--no-renames", "-z", old_sha, new_sha, "--"], dir)
+    if out is None:
+        return None
+    fields = out.split("\0")
+    changes = []
+    for status, path in zip(fields[0::2], fields[1::2]):
+        if status not in ("A", "D"):
+            status = "M"  # also type changes
+        changes.append((status, path))
+    return changes
+
+
+def git_file_contents(dir: str, sha: str, paths: Iterable[str]) -> Optional[Dict[str, Optional[bytes]]]:
+    """
+    Return the contents of the files at `paths` (relative to `dir`) in the commit `sha`,
+    keyed by path; the value is None for a path that is not a file in that commit.
+    Returns None if git failed.
+    """
+    paths = [path for path in paths if "\n" not in path]
+    batch_input = "".join(f"{sha}:./{path}\n" for path in paths).encode("utf-8", errors="surrogateescape")
+    git_result = subprocess.run(["git", "-C", dir, "cat-file", "--batch"], input=batch_input,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if git_result.returncode != 0:
+        log.debug("Git failed:\nCommand was cat-file --batch\nOutput was:\n%s", git_result.stderr)
+        return None
+    out = git_result.stdout
+    contents = {}
+    pos = 0
+    for path in paths:
+        header_end = out.index(b"\n", pos)
+        header = out[pos:header_end].split()
+        pos = header_end + 1
+        contents[path] = None
+        if len(header) == 3 and header[2].isdigit():
+            size = int(header[2])
+            if header[1] == b"blob":
+                contents[path] = out[pos:pos + size]
+            pos += size + 1
+    return contents
+
+
 def git_clone_or_pull(repo, dir, branch, ssh_key=None) -> bool:
     if os.path.exists(os.path.join(dir, ".git")):
         _ = run_git_cmd(["clean", "-df"], dir=dir)
@@ -293,6 +588,35 @@ def git_clone_or_pull(repo, dir, branch, ssh_key=None) -> bool:
     return ok
 
 
+def write_file_atomically(filename: str, write: Callable[[BinaryIO], None], prefix: str) -> None:
+    """Write `filename` by calling write() with a temporary file in the same directory
+    (named starting with `prefix`), which then replaces `filename`.  The file is replaced
+    atomically so concurrent readers never see a partial file.  If write() raises,
+    the temporary file is removed and the exception is passed on.
+    """
+    dirname = os.path.dirname(os.path.abspath(filename))
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=prefix)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+_serials = itertools.count(1)
+
+
+def next_serial() -> int:
+    """Return a number that is unique within this process.  Mutable data objects
+    (e.g. Topology, VOsData) get a new serial whenever they change, so data derived
+    from them can be cached by serial.
+    """
+    return next(_serials)
+
+
 def is_true(input_) -> bool:
     """Convert various types of input to a boolean.  Specifically, strings and bytes are checked for the values
     '1', 'true', 'yes', 'on', case-insensitively.  Other types are just cast to bool using the built-in function.
@@ -332,11 +656,191 @@ def gen_id(instr: AnyStr, mod = 2 ** 31 - 1, minimum=1, hashfn=hashlib.md5) -> i
     return minimum + (int(hashfn(instr_b).hexdigest(), 16) % mod)
 
 
-def load_yaml_file(filename) -> ParsedYaml:
-    """Load a yaml file (wrapper around yaml.safe_load() because it does not
-    report the filename in which an error occurred.
+def python_executable() -> Optional[str]:
+    """The Python interpreter to start worker processes with: sys.executable, unless that
+    is not Python (e.g. httpd, when running under mod_wsgi); then the interpreter of the
+    same version in sys.exec_prefix (i.e. the virtualenv, if any), or None if there is none.
+    """
+    if os.path.basename(sys.executable).startswith("python"):
+        return sys.executable
+    for name in ("python%d.%d" % sys.version_info[:2], "python3"):
+        path = os.path.join(sys.exec_prefix, "bin", name)
+        if os.access(path, os.X_OK):
+            return path
+    return None
+
+
+class YamlCache:
+    """An LRU cache of parsed YAML files, keyed by the path, size, inode and
+    modification time of the file so that an unchanged file is only parsed once.
+
+    The parsed data is stored pickled: callers are free to modify the data they
+    get back, and unpickling is still much faster than parsing the YAML again.
+    The cache can be saved to and loaded from a snapshot file so the work can be
+    shared between processes and survive restarts.
+    """
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, max_entries=8192, snapshot_file=None, load_workers=0):
+        self.max_entries = max_entries
+        self.snapshot_file = snapshot_file
+        self.load_workers = load_workers
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # type: OrderedDict[tuple, bytes]
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(filename) -> Optional[tuple]:
+        path = os.path.abspath(filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return path, st.st_size, st.st_ino, st.st_mtime_ns
+
+    def load(self, filename) -> ParsedYaml:
+        """Load a yaml file, using the cached parse if the file has not changed."""
+        key = self._key(filename) if self.max_entries > 0 else None
+        if key:
+            with self._lock:
+                pickled = self._entries.get(key)
+                if pickled is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+            if pickled is not None:
+                return pickle.loads(pickled)
+        data = _parse_yaml_file(filename)
+        if key:
+            pickled = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+            with self._lock:
+                self.misses += 1
+                self._entries[key] = pickled
+                self._dirty = True
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return data
+
+    def preload(self, filenames: Iterable, workers: Optional[int] = None) -> int:
+        """Parse the files that are not cached yet using a pool of `workers`
+        processes (default: self.load_workers) and add them to the cache, so that
+        loading them afterwards is cheap.  Does nothing if there are fewer than two
+        workers.  Files that fail to parse are skipped; loading them later will
+        report the error.  Returns the number of files added.
+
+        The workers run the Python interpreter from python_executable(), since
+        under mod_wsgi sys.executable is httpd; if there is none, the files are
+        not preloaded.
+        """
+        if workers is None:
+            workers = self.load_workers
+        if not workers or workers < 2 or self.max_entries <= 0:
+            return 0
+        keys = {}
+        for filename in filenames:
+            key = self._key(filename)
+            if key and key not in keys and key not in self._entries:
+                keys[key] = str(filename)
+        if len(keys) < 2:
+            return 0
+        keys = list(keys.items())[-self.max_entries:]
+        executable = python_executable()
+        if not executable:
+            log.warning("No Python interpreter found to parse YAML files in parallel with; loading them sequentially")
+            return 0
+        # Don't fork: the webapp has other threads that may be holding locks
+        context = multiprocessing.get_context("spawn")
+        context.set_executable(executable)
+        chunksize = max(1, len(keys) // (workers * 4))
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                results = list(executor.map(_parse_yaml_file_pickled, [f for _, f in keys], chunksize=chunksize))
+        except Exception as e:
+            log.warning("Unable to parse YAML files in parallel (%s); loading them sequentially", e)
+            return 0
+        added = 0
+        with self._lock:
+            for (key, _), pickled in zip(keys, results):
+                if pickled is not None:
+                    self.misses += 1
+                    self._entries[key] = pickled
+                    added += 1
+            if added:
+                self._dirty = True
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return added
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load_snapshot(self) -> bool:
+        """Add the entries from the snapshot file to the cache.
+        Returns False if there is no usable snapshot.
+        """
+        if not self.snapshot_file:
+            return False
+        try:
+            with open(self.snapshot_file, "rb") as fh:
+                version, entries = pickle.load(fh)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            log.warning("Unable to read YAML cache snapshot %s: %s", self.snapshot_file, e)
+            return False
+        if version != self.SNAPSHOT_VERSION:
+            log.info("Ignoring YAML cache snapshot %s with version %r", self.snapshot_file, version)
+            return False
+        with self._lock:
+            for key, pickled in entries:
+                self._entries.setdefault(key, pickled)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        log.debug("Loaded %d entries from YAML cache snapshot %s", len(entries), self.snapshot_file)
+        return True
+
+    def save_snapshot(self) -> bool:
+        """Write the cache to the snapshot file if it has changed since the last save."""
+        if not self.snapshot_file or not self._dirty:
+            return False
+        with self._lock:
+            entries = list(self._entries.items())
+            self._dirty = False
+        try:
+            write_file_atomically(
+                self.snapshot_file,
+                lambda fh: pickle.dump((self.SNAPSHOT_VERSION, entries), fh, protocol=pickle.HIGHEST_PROTOCOL),
+                prefix=".yamlcache.")
+        except OSError as e:
+            log.warning("Unable to write YAML cache snapshot %s: %s", self.snapshot_file, e)
+            self._dirty = True
+            return False
+        return True
+
+
+yaml_cache = YamlCache()
 
+
+def configure_yaml_cache(config):
+    """Set up `yaml_cache` from the app config and load its snapshot file, if any.
+    Call this once at app setup, before the data is first loaded.
     """
+    # Parsed YAML files are cached across reloads; optionally persisted so that
+    # other processes and restarts can skip parsing unchanged files.
+    yaml_cache.max_entries = config.get("YAML_CACHE_SIZE", yaml_cache.max_entries)
+    yaml_cache.snapshot_file = config.get("YAML_CACHE_FILE")
+    # Number of processes to parse YAML files with on full reloads (0: parse in this process)
+    yaml_cache.load_workers = config.get("TOPOLOGY_LOAD_WORKERS", 0)
+    yaml_cache.load_snapshot()
+
+
+def _parse_yaml_file(filename) -> ParsedYaml:
     try:
         with open(filename, encoding='utf-8', errors='surrogateescape') as stream:
             return yaml.load(stream, Loader=SafeLoader)
@@ -345,6 +849,33 @@ def load_yaml_file(filename) -> ParsedYaml:
         raise
 
 
+def _parse_yaml_file_pickled(filename) -> Optional[bytes]:
+    """Parse a yaml file in a worker process of YamlCache.preload().
+    Returns None on errors; they are reported when the file is loaded for real.
+    """
+    try:
+        with open(filename, encoding='utf-8', errors='surrogateescape') as stream:
+            data = yaml.load(stream, Loader=SafeLoader)
+        return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return None
+
+
+def preload_yaml_files(filenames: Iterable) -> int:
+    """Parse the given yaml files in parallel into `yaml_cache` if parallel loading is enabled."""
+    return yaml_cache.preload(filenames)
+
+
+def load_yaml_file(filename) -> ParsedYaml:
+    """Load a yaml file (wrapper around yaml.safe_load() because it does not
+    report the filename in which an error occurred.
+
+    Unchanged files are served from `yaml_cache` instead of being parsed again.
+
+    """
+    return yaml_cache.load(filename)
+
+
 def readfile(path, logger):
     """ return stripped file contents, or None on errors """
     if path:
@@ -374,8 +905,8 @@ def escape(pattern: str) -> str:
 
 def support_cors(f):
     @wraps(f)
-    def wrapped():
-        response = f()
+    def wrapped(*args, **kwargs):
+        response = f(*args, **kwargs)
 
         response.headers['Access-Control-Allow-Origin'] = '*'
 
@@ -5,6 +5,30 @@ TOPOLOGY_DATA_REPO = "https://github.com/opensciencegrid/topology"
 TOPOLOGY_DATA_BRANCH = "master"
 TOPOLOGY_CACHE_LIFETIME = 60 * 5
 
+# Number of parsed YAML files kept in memory between reloads, and an optional
+# file to persist them in (shared by all processes using the same file)
+YAML_CACHE_SIZE = 8192
+YAML_CACHE_FILE = None
+# Number of processes used to parse YAML files in parallel (0 to parse them in the webapp process).
+# Under mod_wsgi, these run the python of the same version in the WSGIPythonHome (or sys.exec_prefix).
+TOPOLOGY_LOAD_WORKERS = 0
+# File to save the loaded topology/VO/project/mappings data in, so restarted processes
+# can load it instead of parsing the YAML files again (if the topology commit is the same)
+DATA_SNAPSHOT_FILE = None
+# "loader" to load the data from the YAML files and write the snapshot file (default), or "reader"
+# to load the data from the snapshot file, reloading it when it changes; with several worker
+# processes, run one loader so the others don't each parse the YAML files.  A reader loads the
+# data from the YAML files itself while the snapshot file is missing or out of date.
+# Can be set with the TOPOLOGY_DATA_SNAPSHOT_ROLE environment variable.
+DATA_SNAPSHOT_ROLE = "loader"
+
+# Maximum total size of the response bodies cached between data reloads
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# How often to check for cached data that needs to be updated in the background;
+# data is updated once 2/3 of its cache lifetime has passed
+BACKGROUND_UPDATE_INTERVAL = 30
+
 WEBHOOK_DATA_DIR = "/tmp/topology-webhook/topology.git"
 WEBHOOK_DATA_REPO = "https://github.com/opensciencegrid/topology"
 WEBHOOK_DATA_BRANCH = "master"
@@ -1,6 +1,10 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import time
 from flask import Response
 from .common import to_csv, to_json_bytes
-from typing import List
+from typing import Hashable, List, Optional, Tuple
 
 def create_accepted_response(data: List, headers, default=None) -> Response:
     """Provides CSV or JSON options for list of list(string)"""
@@ -20,3 +24,56 @@ def create_accepted_response(data: List, headers, default=None) -> Response:
         return accepted_response_builders[accepted_and_requested.pop()]()
     else:
         return accepted_response_builders[default]()
+
+
+class ResponseCache:
+    """An LRU cache of encoded response bodies, bounded by their total size.
+
+    Keys should include the generations of the data the body was built from
+    (see CachedData.generation) so that entries become unreachable as soon as
+    new data is loaded; such entries are evicted eventually.  Entries may also
+    expire after a time-to-live, for responses that depend on the current time.
+
+    A strong ETag is computed from each body when it is cached.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # type: OrderedDict[Hashable, tuple]
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, str]]:
+        """Return the cached body and its ETag, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            body, etag, expires = entry
+            if expires is not None and time.monotonic() > expires:
+                del self._entries[key]
+                self.size -= len(body)
+                return None
+            self._entries.move_to_end(key)
+            return body, etag
+
+    def put(self, key: Hashable, body: bytes, ttl: Optional[float] = None) -> str:
+        """Cache a body; return its ETag."""
+        etag = hashlib.sha1(body).hexdigest()
+        if len(body) > self.max_bytes:
+            return etag
+        expires = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self.size -= len(old_entry[0])
+            self._entries[key] = (body, etag, expires)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (old_body, _, _) = self._entries.popitem(last=False)
+                self.size -= len(old_body)
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
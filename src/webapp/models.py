@@ -1,9 +1,11 @@
 import contextlib
 import datetime
+from collections import namedtuple
 import logging
 import os
+import threading
 import time
-from typing import Dict, Set, List, Optional
+from typing import Dict, Iterable, Set, List, Optional, Tuple
 
 import yaml
 try:
@@ -23,7 +25,8 @@ except ImportError:
             pass
 
 
-from webapp import common, contacts_reader, ldap_data, mappings, project_reader, rg_reader, vo_reader
+from webapp import common, contacts_reader, ldap_data, mappings, oasis_managers, project_reader, rg_reader, \
+    snapshot_file, vo_reader
 from webapp.common import readfile
 from webapp.contacts_reader import ContactsData
 from webapp.topology import Topology, Downtime
@@ -39,31 +42,159 @@ comanage_update_summary = Summary('comanage_update_seconds', 'Time spent updatin
 
 
 class CachedData:
+    """Data that is cached for `cache_lifetime` seconds.
+
+    Refreshes are single-flight: while one thread is updating the data (i.e.
+    should_update() returned True for it and it has not called update() or
+    try_again() yet), should_update() returns False for the other threads so
+    they keep using the previous data.  If there is no data yet, they first
+    wait up to `first_load_timeout` seconds for the update to finish.
+    A refresh that takes longer than `refresh_timeout` seconds (e.g. because
+    it raised in strict mode) is considered abandoned and may be taken over.
+    """
     def __init__(self, data=None, timestamp=0, force_update=True, cache_lifetime=60*15,
-                 retry_delay=60):
+                 retry_delay=60, first_load_timeout=60, refresh_timeout=60*10):
         self.data = data
         self.timestamp = timestamp
         self.force_update = force_update
         self.cache_lifetime = cache_lifetime
         self.retry_delay = retry_delay
+        self.first_load_timeout = first_load_timeout
+        self.refresh_timeout = refresh_timeout
         self.next_update = self.timestamp + self.cache_lifetime
+        # Incremented every time new data is cached
+        self.generation = 0
+        # Commit of the repo the data was loaded from, if known
+        self.commit = None  # type: Optional[str]
+        self._init_refresh_state()
+
+    def _init_refresh_state(self):
+        self._refresh_cond = threading.Condition()
+        # (thread ident, start time) of the refresh in progress
+        self._refresher = None  # type: Optional[Tuple[int, float]]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_refresh_cond"]
+        del state["_refresher"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_refresh_state()
+
+    def _is_expired(self, lead_time=0):
+        return self.force_update or not self.data or time.monotonic() + lead_time > self.next_update
+
+    def _is_refreshing_thread(self):
+        refresher = self._refresher
+        return refresher is not None and refresher[0] == threading.get_ident()
 
     def should_update(self):
         """Return True if we should update, either because we're past the next update time
-        or because force_update is True.
+        or because force_update is True, and no other thread is already updating.
+        Also returns True if this thread claimed the update with claim_refresh().
+        The caller must then call update() or try_again().
+        """
+        if self._is_refreshing_thread():
+            return True
+        return self.claim_refresh()
+
+    def claim_refresh(self, lead_time=0):
+        """Return True if the data expires within `lead_time` seconds and no other
+        thread is already updating it; this thread then has to do the update.
         """
-        return self.force_update or not self.data or time.monotonic() > self.next_update
+        if not self._is_expired(lead_time):
+            return False
+        with self._refresh_cond:
+            # Check again: another thread may have finished updating while we waited for the lock
+            if not self._is_expired(lead_time):
+                return False
+            now = time.monotonic()
+            ident = threading.get_ident()
+            if (self._refresher is None or self._refresher[0] == ident
+                    or now - self._refresher[1] > self.refresh_timeout):
+                self._refresher = (ident, now)
+                return True
+            if self.data is None:
+                self._refresh_cond.wait_for(lambda: self._refresher is None, timeout=self.first_load_timeout)
+            return False
+
+    def _finish_refresh(self):
+        with self._refresh_cond:
+            self._refresher = None
+            self._refresh_cond.notify_all()
+
+    def release_refresh(self):
+        """Let other threads update the data again if this thread claimed the update
+        but did not call update() or try_again()."""
+        if self._is_refreshing_thread():
+            self._finish_refresh()
 
     def try_again(self):
         """Set the next update time to now + the retry delay."""
         self.next_update = time.monotonic() + self.retry_delay
+        self._finish_refresh()
 
-    def update(self, data):
-        """Cache new data and set the next update time to now + the cache lifetime."""
+    def update(self, data, commit: Optional[str] = None):
+        """Cache new data, loaded from the repo at `commit` if given,
+        and set the next update time to now + the cache lifetime."""
+        # Set the commit after the data, and read it before the data: then the
+        # data is never older than the commit it is said to come from
         self.data = data
+        self.commit = commit
+        self.generation += 1
         self.timestamp = time.monotonic()
         self.next_update = self.timestamp + self.cache_lifetime
         self.force_update = False
+        self._finish_refresh()
+
+    def renew(self, commit: Optional[str] = None):
+        """Keep the cached data, which is still current as of `commit` (e.g. because none of
+        it changed since it was loaded), and set the next update time to now + the cache lifetime.
+        Unlike update(), this keeps the generation, so nothing derived from the data is rebuilt."""
+        self.commit = commit
+        self.timestamp = time.monotonic()
+        self.next_update = self.timestamp + self.cache_lifetime
+        self.force_update = False
+        self._finish_refresh()
+
+    def expire(self):
+        """Make the data due for an update now, e.g. because the data it is derived from changed."""
+        self.next_update = float("-inf")
+
+
+class DataSnapshot(namedtuple("DataSnapshot", "generation topology vos_data projects mappings contacts_data "
+                                               "sources commits")):
+    """An immutable, consistent set of the topology, VO, project, mappings and
+    contacts data (or of the ones asked for), made by GlobalData.get_snapshot().
+    `generation` is different for every snapshot, and a new snapshot is made every
+    time any of its data is reloaded, so it can be used as the version of everything
+    derived from the snapshot.  `commits` are the commits of the topology repo
+    that each of the DATASETS was loaded from (or found to be unchanged at), where known;
+    a new snapshot is also made when they change.
+
+    Has the same get_*() methods as GlobalData, so it can be passed to functions
+    that take a GlobalData and need several datasets that belong together.
+    """
+    __slots__ = ()
+
+    DATASETS = ("topology", "vos_data", "projects", "mappings", "contacts_data")
+
+    def get_topology(self) -> Optional[Topology]:
+        return self.topology
+
+    def get_vos_data(self) -> Optional[VOsData]:
+        return self.vos_data
+
+    def get_projects(self) -> Optional[Dict]:
+        return self.projects
+
+    def get_mappings(self) -> Optional[mappings.Mappings]:
+        return self.mappings
+
+    def get_contacts_data(self) -> Optional[ContactsData]:
+        return self.contacts_data
 
 
 class GlobalData:
@@ -80,6 +211,10 @@ class GlobalData:
         topology_cache_lifetime = config.get("TOPOLOGY_CACHE_LIFETIME", config.get("CACHE_LIFETIME", 60*15))
         self.contacts_data = CachedData(cache_lifetime=contact_cache_lifetime)
         self.comanage_data = CachedData(cache_lifetime=contact_cache_lifetime)
+        self.osg_ldap_id_map = CachedData(cache_lifetime=contact_cache_lifetime)
+        self.oasis_managers_info = CachedData(cache_lifetime=contact_cache_lifetime)
+        # Generation of self.vos_data that self.oasis_managers_info was last updated for
+        self._oasis_managers_vos_generation = None  # type: Optional[int]
         self.merged_contacts_data = CachedData(cache_lifetime=contact_cache_lifetime)
         self.api_key_set = CachedData(cache_lifetime=contact_cache_lifetime)
         self.dn_set = CachedData(cache_lifetime=topology_cache_lifetime)
@@ -114,8 +249,232 @@ class GlobalData:
         self.topology_dir = os.path.join(self.topology_data_dir, "topology")
         self.vos_dir = os.path.join(self.topology_data_dir, "virtual-organizations")
         self.mappings_dir = os.path.join(self.topology_data_dir, "mappings")
+        # Only reload the parts of the topology data that changed in git since the last load.
+        # Off by default when we don't manage the git checkout, since uncommitted local edits
+        # would not be picked up.
+        self.incremental_topology_reload = config.get("TOPOLOGY_INCREMENTAL_RELOAD", not config["NO_GIT"])
+        # The linked topology/VO/project/mappings data is saved here after it is
+        # (re)loaded in the background, and loaded from here instead of the YAML
+        # files on the first load, if it was saved for the current commit.
+        self.data_snapshot_file = config.get("DATA_SNAPSHOT_FILE")
+        # With the "reader" role, that data is loaded from the data snapshot file (written by another
+        # process with the default "loader" role), and reloaded when it changes.  While the file is
+        # missing or out of date, the data is loaded from the YAML files; see _check_data_snapshot_file().
+        self.data_snapshot_reader = bool(self.data_snapshot_file) and config.get("DATA_SNAPSHOT_ROLE") == "reader"
+        # Whether this reader loads the data itself, and since when the file has been missing or out of date
+        self._data_snapshot_fallback = False
+        self._data_snapshot_stale_since = time.monotonic()  # type: Optional[float]
+        # The commit of the data last loaded from the file by this reader
+        self._data_snapshot_file_commit = None  # type: Optional[str]
+        self._data_snapshot_file_checked = False
+        self._data_snapshot_file_sources = None
+        self._data_snapshot_file_stat = None
         self.config = config
         self.strict = strict
+        # The latest snapshot of each combination of datasets; see get_snapshot()
+        self._snapshots = {}  # type: Dict[Tuple[str, ...], DataSnapshot]
+        self._init_locks()
+
+    def _init_locks(self):
+        self._snapshot_lock = threading.Lock()
+        self._data_snapshot_file_lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_snapshot_lock"]
+        del state["_data_snapshot_file_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_locks()
+
+    def _load_data_snapshot_file(self) -> bool:
+        """
+        Load the topology, VO, project and mappings data from the data snapshot file
+        the first time any of them is needed, if the file is for the current commit
+        of the topology repo (after pulling it, if we manage the checkout).
+        Otherwise they are loaded from the YAML files as usual.
+
+        Returns True if this process gets the data from the data snapshot file only
+        (the "reader" role, unless it fell back to loading the data itself); the data
+        is then not loaded from the YAML files.
+        """
+        if self.data_snapshot_reader:
+            if self.topology.data is None and not self._data_snapshot_fallback:
+                self._wait_for_data_snapshot_file()
+            return not self._data_snapshot_fallback
+        if not self.data_snapshot_file or self._data_snapshot_file_checked:
+            return False
+        with self._data_snapshot_file_lock:
+            if self._data_snapshot_file_checked:
+                return False
+            self._data_snapshot_file_checked = True
+            # Don't serve the commit from before the restart until the next reload
+            if not self.maybe_update_topology_repo():
+                return False
+            sha = self._topology_repo_head()
+            if not sha:
+                return False
+            loaded = snapshot_file.load(self.data_snapshot_file, sha, self.get_contacts_data())
+            if loaded is None:
+                return False
+            self._install_data_snapshot(*loaded)
+            self._data_snapshot_file_sources = ((self.topology.generation, self.vos_data.generation,
+                                                 self.projects.generation, self.mappings.generation),
+                                                (sha,) * len(snapshot_file.DATASETS))
+            log.info("Loaded topology data for %s from %s", sha, self.data_snapshot_file)
+        return False
+
+    def _install_data_snapshot(self, sha: str, data: Dict) -> None:
+        self.topology.update(data["topology"], sha)
+        self.vos_data.update(data["vos_data"], sha)
+        self.projects.update(data["projects"], sha)
+        self.mappings.update(data["mappings"], sha)
+
+    def _wait_for_data_snapshot_file(self) -> None:
+        """For the reader role, if there is no data yet: wait for the data snapshot file to be
+        written, until `first_load_timeout` seconds after startup.  Then fall back to loading
+        the data from the YAML files, e.g. because there is no loader process.
+        """
+        deadline = (self._data_snapshot_stale_since or time.monotonic()) + self.topology.first_load_timeout
+        while True:
+            self._read_data_snapshot_file()
+            now = time.monotonic()
+            if self.topology.data is not None or self._data_snapshot_fallback:
+                return
+            if now >= deadline:
+                break
+            time.sleep(min(1.0, deadline - now))
+        log.warning("No data snapshot in %s yet; loading the data from the YAML files", self.data_snapshot_file)
+        self._data_snapshot_fallback = True
+
+    def _check_data_snapshot_file(self) -> None:
+        """For the reader role: reload the data from the data snapshot file if the file changed.
+        If the file has been missing, or for an older commit than the topology repo is at, for
+        more than `first_load_timeout` seconds, load the data from the YAML files instead
+        until the file is for the current commit again.
+        """
+        head = self._topology_repo_head()
+        # While falling back, only the file for the current commit is newer than our data
+        self._read_data_snapshot_file(head if self._data_snapshot_fallback else None)
+        file_commit = self._data_snapshot_file_commit
+        if file_commit is not None and (file_commit == head or not head):
+            if self._data_snapshot_fallback:
+                log.info("Data snapshot %s is up to date; loading the data from it again", self.data_snapshot_file)
+            self._data_snapshot_fallback = False
+            self._data_snapshot_stale_since = None
+            return
+        now = time.monotonic()
+        if self._data_snapshot_stale_since is None:
+            self._data_snapshot_stale_since = now
+        if not self._data_snapshot_fallback and now - self._data_snapshot_stale_since > self.topology.first_load_timeout:
+            log.warning("Data snapshot %s is missing or for an older commit than %s; loading the data from "
+                        "the YAML files", self.data_snapshot_file, head)
+            self._data_snapshot_fallback = True
+            for cached in (self.topology, self.vos_data, self.projects, self.mappings):
+                cached.expire()
+
+    def _read_data_snapshot_file(self, repo_sha: Optional[str] = None) -> None:
+        """(Re)load the data from the data snapshot file if the file changed since the last load
+        (and is for the commit `repo_sha`, if given)"""
+        with self._data_snapshot_file_lock:
+            try:
+                st = os.stat(self.data_snapshot_file)
+            except FileNotFoundError:
+                log.debug("Data snapshot %s has not been written yet", self.data_snapshot_file)
+                return
+            except OSError as e:
+                log.warning("Unable to read data snapshot %s: %s", self.data_snapshot_file, e)
+                return
+            # The file is replaced (not rewritten) by the loader, so a new version has a new inode
+            stat = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if stat == self._data_snapshot_file_stat:
+                return
+            loaded = snapshot_file.load(self.data_snapshot_file, repo_sha, self.get_contacts_data())
+            if loaded is None:
+                return
+            self._install_data_snapshot(*loaded)
+            self._data_snapshot_file_stat = stat
+            self._data_snapshot_file_commit = loaded[0]
+            log.info("Loaded topology data for %s from %s", loaded[0], self.data_snapshot_file)
+
+    def _save_data_snapshot_file(self, snapshot: DataSnapshot) -> None:
+        """Write the data in `snapshot` to the data snapshot file if it changed since the last write,
+        and all of it was loaded from the same commit"""
+        if not self.data_snapshot_file or self.data_snapshot_reader:
+            return
+        data = {name: getattr(snapshot, name) for name in snapshot_file.DATASETS}
+        # The data is the same if the commit changed but nothing in the data did; the file has to say so
+        sources = (snapshot.sources[:len(snapshot_file.DATASETS)], snapshot.commits[:len(snapshot_file.DATASETS)])
+        if any(value is None for value in data.values()) or sources == self._data_snapshot_file_sources:
+            return
+        commits = set(sources[1])
+        if len(commits) != 1 or None in commits:
+            log.debug("Not writing data snapshot: the data is from different commits (%s)", commits)
+            return
+        if snapshot_file.save(self.data_snapshot_file, commits.pop(), data):
+            self._data_snapshot_file_sources = sources
+
+    @property
+    def topology_sha(self) -> Optional[str]:
+        """The commit of the topology repo that the topology data was loaded from"""
+        return self.topology.commit
+
+    def _topology_repo_head(self) -> Optional[str]:
+        """The commit the topology repo is at, i.e. that data loaded from it now comes from.
+        Get it before loading the data: if the repo is updated in between, the data is then
+        newer than the commit it is said to come from, never older.
+        """
+        return common.git_head_sha(self.topology_data_dir)
+
+    def get_snapshot(self, datasets: Iterable[str] = DataSnapshot.DATASETS) -> DataSnapshot:
+        """
+        Get a DataSnapshot of the current data.  Only the `datasets` (the names of the
+        DataSnapshot fields, e.g. "topology"; default: all of them) are loaded or
+        refreshed first, and the others are None in the snapshot.
+        The same snapshot is returned until any of that data is reloaded.
+        Any of the data in it may be None if we fail to get it for the first time.
+        """
+        getters = {
+            "topology": self.get_topology,
+            "vos_data": self.get_vos_data,
+            "projects": self.get_projects,
+            "mappings": self.get_mappings,
+            "contacts_data": self.get_contacts_data,
+        }
+        datasets = tuple(datasets)
+        for name in datasets:
+            getters[name]()
+        return self._make_snapshot(datasets)
+
+    def _make_snapshot(self, datasets: Tuple[str, ...] = DataSnapshot.DATASETS) -> DataSnapshot:
+        """Return the current snapshot of `datasets`, or a new one if any of that data was reloaded"""
+        cached_data = {
+            "topology": self.topology,
+            "vos_data": self.vos_data,
+            "projects": self.projects,
+            "mappings": self.mappings,
+            "contacts_data": self.merged_contacts_data,
+        }
+        with self._snapshot_lock:
+            # Get the generations and commits before the data: if the data is reloaded
+            # in between, the next call makes a new snapshot
+            sources = tuple(cached_data[name].generation if name in datasets else None
+                            for name in DataSnapshot.DATASETS)
+            commits = tuple(cached_data[name].commit if name in datasets else None
+                            for name in DataSnapshot.DATASETS)
+            snapshot = self._snapshots.get(datasets)
+            if snapshot is None or snapshot.sources != sources or snapshot.commits != commits:
+                snapshot = DataSnapshot(
+                    generation=common.next_serial(),
+                    sources=sources,
+                    commits=commits,
+                    **{name: cached_data[name].data if name in datasets else None
+                       for name in DataSnapshot.DATASETS}
+                )
+                self._snapshots[datasets] = snapshot
+        return snapshot
 
     def update_webhook_repo(self):
         if not self.config["NO_GIT"]:
@@ -180,6 +539,49 @@ class GlobalData:
             return False
         return True
 
+    def refresh_all(self) -> None:
+        """
+        Update all the cached data that is past 2/3 of its lifetime, so that
+        requests do not have to wait for the update.  The data is updated in
+        dependency order (e.g. contacts before topology, VOs before projects).
+        """
+        datasets = [
+            (self.contacts_data, self.get_contact_db_data),
+            (self.osg_ldap_id_map, self.get_osg_ldap_id_map),
+            (self.comanage_data, self.get_comanage_data),
+            (self.merged_contacts_data, self.get_contacts_data),
+            (self.dn_set, self.get_dns),
+            (self.api_key_set, self.get_api_keys),
+            # Pull the topology repo once, before the data loaded from it
+            (self.topology_repo_stamp, self.maybe_update_topology_repo),
+            (self.topology, self.get_topology),
+            (self.vos_data, self.get_vos_data),
+            (self.projects, self.get_projects),
+            (self.mappings, self.get_mappings),
+            (self.oasis_managers_info, self.get_oasis_managers_info),
+        ]
+        ldap_configured = self.osg_ldap_url and self.osg_ldap_user and self.osg_ldap_passfile
+        for cached, getter in datasets:
+            if not ldap_configured and cached in (self.osg_ldap_id_map, self.oasis_managers_info):
+                continue
+            if self.data_snapshot_reader and cached in (self.topology_repo_stamp, self.topology, self.vos_data,
+                                                        self.projects, self.mappings):
+                if cached is self.topology_repo_stamp:
+                    self._check_data_snapshot_file()
+                if not self._data_snapshot_fallback:
+                    continue
+            if not cached.claim_refresh(cached.cache_lifetime / 3):
+                continue
+            try:
+                getter()
+            except Exception as err:
+                log.exception("Background update failed (%s)", err)
+                cached.try_again()
+            finally:
+                cached.release_refresh()
+        # Make the snapshot for the new data here instead of in the next request
+        self._save_data_snapshot_file(self._make_snapshot())
+
     def get_contact_db_data(self) -> Optional[ContactsData]:
         """
         Get the contact information from a private git repo
@@ -219,6 +621,8 @@ class GlobalData:
             with comanage_update_summary.time():
                 try:
                     idmap = self.get_osg_ldap_id_map()
+                    if idmap is None:
+                        raise ValueError("No OSG LDAP data")
                     data = ldap_data.cilogon_id_map_to_yaml_data(idmap)
                     self.comanage_data.update(ContactsData(data))
                 except Exception as err:
@@ -229,11 +633,56 @@ class GlobalData:
 
         return self.comanage_data.data
 
-    def get_osg_ldap_id_map(self):
-        url = self.osg_ldap_url
-        user = self.osg_ldap_user
-        ldappass = readfile(self.osg_ldap_passfile, log)
-        return ldap_data.get_osg_ldap_id_map(url, user, ldappass)
+    def get_osg_ldap_id_map(self, ldappass=None) -> Optional[Dict]:
+        """
+        Get the OSG LDAP data for each CILogonID (see ldap_data.get_osg_ldap_id_map()),
+        shared by the comanage data and the OASIS managers info.
+        `ldappass` is read from the OSG_LDAP_PASSFILE if not given.
+        May return None if we fail to get the data for the first time.
+        """
+        if self.osg_ldap_id_map.should_update():
+            try:
+                if ldappass is None:
+                    ldappass = readfile(self.osg_ldap_passfile, log)
+                idmap = ldap_data.get_osg_ldap_id_map(self.osg_ldap_url, self.osg_ldap_user, ldappass)
+                if idmap is not None:
+                    self.osg_ldap_id_map.update(idmap)
+                else:
+                    log.error("Failed to bind to the OSG LDAP")
+                    self.osg_ldap_id_map.try_again()
+            except Exception as err:
+                if self.strict:
+                    raise
+                log.exception("Failed to update OSG LDAP data (%s)", err)
+                self.osg_ldap_id_map.try_again()
+
+        return self.osg_ldap_id_map.data
+
+    def get_oasis_managers_info(self, ldappass=None) -> Optional[Dict[str, List[Dict]]]:
+        """
+        Get the OASIS managers info for all VOs (see oasis_managers.get_all_managers_info()).
+        It is also updated when the VO data, which lists the managers, is reloaded.
+        May return None if we fail to get the data for the first time.
+        """
+        self.get_vos_data()
+        vos_generation = self.vos_data.generation
+        if vos_generation != self._oasis_managers_vos_generation:
+            self._oasis_managers_vos_generation = vos_generation
+            self.oasis_managers_info.expire()
+        if self.oasis_managers_info.should_update():
+            idmap = self.get_osg_ldap_id_map(ldappass)
+            if idmap is not None:
+                try:
+                    self.oasis_managers_info.update(oasis_managers.get_all_managers_info(self, idmap))
+                except Exception as err:
+                    if self.strict:
+                        raise
+                    log.exception("Failed to update OASIS managers info (%s)", err)
+                    self.oasis_managers_info.try_again()
+            else:
+                self.oasis_managers_info.try_again()
+
+        return self.oasis_managers_info.data
 
     def get_contacts_data(self) -> Optional[ContactsData]:
         """
@@ -267,7 +716,7 @@ class GlobalData:
                 if self.strict:
                     raise
                 log.exception("Failed to update DNs (%s)", err)
-                self.contacts_data.try_again()
+                self.dn_set.try_again()
         return self.dn_set.data
 
     def get_api_keys(self) -> Optional[Dict[str, str]]:
@@ -289,6 +738,8 @@ class GlobalData:
         Get Topology data.
         May return None if we fail to get the data for the first time.
         """
+        if self._load_data_snapshot_file():
+            return self.topology.data
         if self.topology.should_update():
             with topology_update_summary.time():
                 self.update_topology()
@@ -303,7 +754,18 @@ class GlobalData:
         if ok:
             try:
                 log.debug("Updating topology RG data")
-                self.topology.update(rg_reader.get_topology(self.topology_dir, self.get_contacts_data(), strict=self.strict))
+                contacts_data = self.get_contacts_data()
+                sha = self._topology_repo_head()
+                topology = None
+                if self.incremental_topology_reload and sha and self.topology_sha and self.topology.data:
+                    topology = self._update_topology_incrementally(sha, contacts_data)
+                if topology is None:
+                    topology = rg_reader.get_topology(self.topology_dir, contacts_data, strict=self.strict)
+                if topology is self.topology.data:
+                    self.topology.renew(sha)
+                else:
+                    self.topology.update(topology, sha)
+                common.yaml_cache.save_snapshot()
                 log.debug("Updated topology RG data successfully")
             except Exception as err:
                 if self.strict:
@@ -313,18 +775,39 @@ class GlobalData:
         else:
             self.topology.try_again()
 
+    def _update_topology_incrementally(self, sha: str, contacts_data: Optional[ContactsData]) -> Optional[Topology]:
+        """
+        Apply the changes between the commit the current topology data was loaded from
+        and `sha` to the current topology data.
+        Returns None if that's not possible and a full reload is needed.
+        """
+        changed_paths = common.git_changed_paths(self.topology_dir, self.topology_sha, sha)
+        if changed_paths is None:
+            return None
+        topology = rg_reader.update_topology(self.topology.data, self.topology_dir, changed_paths,
+                                             contacts_data, strict=self.strict)
+        if topology:
+            log.debug("Incrementally updated topology from %s to %s (%d changed files)",
+                      self.topology_sha, sha, len(changed_paths))
+        return topology
+
     def get_vos_data(self) -> Optional[VOsData]:
         """
         Get VO Data.
         May return None if we fail to get the data for the first time.
         """
+        if self._load_data_snapshot_file():
+            return self.vos_data.data
         if self.vos_data.should_update():
             with topology_update_summary.time():
                 ok = self.maybe_update_topology_repo()
                 if ok:
                     try:
                         log.debug("Updating VOs")
-                        self.vos_data.update(vo_reader.get_vos_data(self.vos_dir, self.get_contacts_data(), strict=self.strict))
+                        sha = self._topology_repo_head()
+                        self.vos_data.update(vo_reader.get_vos_data(self.vos_dir, self.get_contacts_data(), strict=self.strict),
+                                             sha)
+                        common.yaml_cache.save_snapshot()
                         log.debug("Updated VOs successfully")
                     except Exception as err:
                         if self.strict:
@@ -341,13 +824,20 @@ class GlobalData:
         Get Project data.
         May return None if we fail to get the data for the first time.
         """
+        if self._load_data_snapshot_file():
+            return self.projects.data
         if self.projects.should_update():
+            # Projects refer to VOs; reuse the cached VO data instead of loading the VOs again
+            vos_data = self.get_vos_data()
             with topology_update_summary.time():
                 ok = self.maybe_update_topology_repo()
                 if ok:
                     try:
                         log.debug("Updating projects")
-                        self.projects.update(project_reader.get_projects(self.projects_dir, strict=self.strict))
+                        sha = self._topology_repo_head()
+                        self.projects.update(project_reader.get_projects(self.projects_dir, strict=self.strict,
+                                                                         vos_data=vos_data), sha)
+                        common.yaml_cache.save_snapshot()
                         log.debug("Updated projects successfully")
                     except Exception as err:
                         if self.strict:
@@ -366,13 +856,17 @@ class GlobalData:
         """
         if strict is None:
             strict = self.strict
+        if self._load_data_snapshot_file():
+            return self.mappings.data
         if self.mappings.should_update():
             with topology_update_summary.time():
                 ok = self.maybe_update_topology_repo()
                 if ok:
                     try:
                         log.debug("Updating mappings")
-                        self.mappings.update(mappings.get_mappings(indir=self.mappings_dir, strict=strict))
+                        sha = self._topology_repo_head()
+                        self.mappings.update(mappings.get_mappings(indir=self.mappings_dir, strict=strict), sha)
+                        common.yaml_cache.save_snapshot()
                         log.debug("Updated mappings successfully")
                     except Exception as err:
                         if self.strict:
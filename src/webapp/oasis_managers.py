@@ -2,7 +2,6 @@
 
 
 from webapp.common import safe_dict_get
-from webapp.ldap_data import get_osg_ldap_id_map
 from webapp.ldap_data import cilogon_id_map_to_ssh_keys
 from webapp.ldap_data import get_contact_cilogon_id_map
 
@@ -21,27 +20,33 @@ def get_oasis_manager_endpoint_info(global_data, vo, ldappass):
 
             {vo: OASISManagers}
 
-        where OASISManagers is a list as described above for each vo. """
+        where OASISManagers is a list as described above for each vo.
 
-    if vo != "*":
-        managers = get_vo_oasis_managers(global_data, vo)
-        if not managers:
-            return []
+        The info comes from the cached result of get_all_managers_info() in
+        global_data; returns None if that is not available and there are
+        managers to look up. """
 
-    ldap_url = global_data.osg_ldap_url
-    ldap_user = global_data.osg_ldap_user
-    cilogon_id_map = get_osg_ldap_id_map(ldap_url, ldap_user, ldappass)
-    ssh_keys_map = cilogon_id_map_to_ssh_keys(cilogon_id_map)
-    contact_cilogon_ids = get_contact_cilogon_id_map(global_data)
+    if vo != "*" and not get_vo_oasis_managers(global_data, vo):
+        return []
 
+    all_managers_info = global_data.get_oasis_managers_info(ldappass)
+    if all_managers_info is None:
+        return None
     if vo == "*":
-        vo_managers = get_all_oasis_managers(global_data)
-        return {
-            vo: get_managers_info(managers, contact_cilogon_ids, ssh_keys_map)
-            for vo,managers in vo_managers.items()
-        }
-    else:
-        return get_managers_info(managers, contact_cilogon_ids, ssh_keys_map)
+        return all_managers_info
+    return all_managers_info.get(vo, [])
+
+
+def get_all_managers_info(global_data, cilogon_id_map):
+    """ return dict of oasis manager info lists (see get_managers_info)
+        for all vos, given the OSG LDAP id map """
+    ssh_keys_map = cilogon_id_map_to_ssh_keys(cilogon_id_map)
+    contact_cilogon_ids = get_contact_cilogon_id_map(global_data)
+    vo_managers = get_all_oasis_managers(global_data)
+    return {
+        vo: get_managers_info(managers, contact_cilogon_ids, ssh_keys_map)
+        for vo,managers in vo_managers.items()
+    }
 
 
 def get_managers_info(managers, contact_cilogon_ids, ssh_keys_map):
@@ -6,14 +6,14 @@ import logging
 import os
 import pprint
 import sys
-from typing import Dict
+from typing import Dict, Optional
 
 import yaml
 
 if __name__ == "__main__" and __package__ is None:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from webapp.common import load_yaml_file, to_xml, is_null, gen_id_from_yaml
+from webapp.common import load_yaml_file, preload_yaml_files, to_xml, is_null, gen_id_from_yaml
 from webapp.vo_reader import get_vos_data
 from webapp.vos_data import VOsData
 
@@ -86,12 +86,18 @@ def get_campus_grid_ids(indir="."):
     return load_yaml_file(os.path.join(indir, "_CAMPUS_GRIDS.yaml"))
 
 
-def get_projects(indir="../projects", strict=False):
+def get_projects(indir="../projects", strict=False, vos_data: Optional[VOsData] = None):
+    """Load the projects in `indir`.  VO sponsors are looked up in `vos_data`;
+    if not given, the VOs are loaded from the virtual-organizations directory
+    next to `indir`.
+    """
     to_output = {"Projects":{"Project": []}}
     projects = []
 
+    preload_yaml_files(os.path.join(indir, file) for file in os.listdir(indir) if file.endswith(".yaml"))
     campus_grid_ids = get_campus_grid_ids(indir)
-    vos_data = get_vos_data(os.path.join(indir, "../virtual-organizations"), None)
+    if vos_data is None:
+        vos_data = get_vos_data(os.path.join(indir, "../virtual-organizations"), None)
 
     for file in os.listdir(indir):
         if not file.endswith(".yaml"):
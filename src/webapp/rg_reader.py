@@ -16,13 +16,14 @@ import logging
 import pprint
 import sys
 from pathlib import Path
+from typing import List, Optional
 import yaml
 
 # thanks stackoverflow
 if __name__ == "__main__" and __package__ is None:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from webapp.common import ensure_list, to_xml, Filters, load_yaml_file, gen_id_from_yaml
+from webapp.common import ensure_list, to_xml, Filters, load_yaml_file, gen_id_from_yaml, preload_yaml_files
 from webapp.contacts_reader import get_contacts_data
 from webapp.topology import CommonData, Topology
 
@@ -62,6 +63,7 @@ def get_rgsummary_rgdowntime(indir, contacts_file=None, authorized=False, strict
 
 def get_topology(indir="../topology", contacts_data=None, strict=False):
     root = Path(indir)
+    preload_yaml_files(root.glob("*/*/*.yaml"))
     support_centers = load_yaml_file(root / "support-centers.yaml")
     service_types = load_yaml_file(root / "services.yaml")
     tables = CommonData(contacts=contacts_data, service_types=service_types, support_centers=support_centers)
@@ -106,17 +108,7 @@ def get_topology(indir="../topology", contacts_data=None, strict=False):
                 # load_yaml_file() already logs the specific error
                 log.error(skip_msg)
                 continue
-        downtime_yaml_path = yaml_path.with_name(name + "_downtime.yaml")
-        downtimes = None
-        if downtime_yaml_path.exists():
-            try:
-                downtimes = ensure_list(load_yaml_file(downtime_yaml_path))
-            except yaml.YAMLError:
-                if strict:
-                    raise
-                # load_yaml_file() already logs the specific error
-                log.error(skip_msg)
-                # keep going with downtimes=None
+        downtimes = _load_downtimes(yaml_path.with_name(name + "_downtime.yaml"), strict)
 
         topology.add_rg(facility, site, name, rg)
         if downtimes:
@@ -126,6 +118,71 @@ def get_topology(indir="../topology", contacts_data=None, strict=False):
     return topology
 
 
+def _load_downtimes(downtime_yaml_path: Path, strict=False) -> Optional[List]:
+    """Load the list of downtimes in an RG's downtime file.
+    Returns None if the file does not exist or (in non-strict mode) cannot be parsed.
+    """
+    if not downtime_yaml_path.exists():
+        return None
+    try:
+        return ensure_list(load_yaml_file(downtime_yaml_path))
+    except yaml.YAMLError:
+        if strict:
+            raise
+        # load_yaml_file() already logs the specific error
+        log.error("skipping (non-strict mode)")
+        return None
+
+
+def update_topology(topology: Topology, indir, changed_paths: List[str], contacts_data=None,
+                    strict=False) -> Optional[Topology]:
+    """Incrementally apply changes to a previously loaded Topology.
+
+    `changed_paths` are the paths (relative to `indir`) of the files that changed
+    since `topology` was loaded.  Returns a new Topology that shares the unchanged
+    facility/site/RG/resource objects with `topology` and has the downtimes of the
+    affected RGs reloaded; `topology` is left untouched.  Returns `topology` itself
+    if nothing changed.
+
+    Only changes to downtime files of existing RGs can be applied this way;
+    returns None if anything else changed, in which case the caller should do a
+    full load with get_topology().  The same goes for changes to the contacts data,
+    since the resources that show it are shared.
+    """
+    old_contacts = topology.common_data.contacts
+    if contacts_data is not old_contacts and (
+            contacts_data is None or old_contacts is None or contacts_data.yaml_data != old_contacts.yaml_data):
+        log.debug("Contacts data changed; cannot update topology incrementally")
+        return None
+    root = Path(indir)
+    rg_paths = {}
+    for path in changed_paths:
+        parts = Path(path).parts
+        if len(parts) != 3 or not parts[2].endswith("_downtime.yaml"):
+            log.debug("%s changed; cannot update topology incrementally", path)
+            return None
+        facility, site, filename = parts
+        name = filename[:-len("_downtime.yaml")]
+        rg = topology.rgs.get((site, name))
+        if not rg or rg.site.facility.name != facility:
+            log.debug("%s does not belong to a loaded RG; cannot update topology incrementally", path)
+            return None
+        rg_paths[(site, name)] = root / path
+    if not rg_paths:
+        return topology
+
+    new_topology = topology.copy_without_downtimes(rg_paths.keys())
+    for (site, name), downtime_yaml_path in rg_paths.items():
+        downtimes = _load_downtimes(downtime_yaml_path, strict)
+        if downtimes:
+            for downtime in downtimes:
+                new_topology.add_downtime(site, name, downtime)
+    # The reloaded downtimes were added last; put them where a full load would have
+    new_topology.sort_downtimes()
+
+    return new_topology
+
+
 def main(argv):
     parser = ArgumentParser()
     parser.add_argument("indir", help="input dir for topology data")
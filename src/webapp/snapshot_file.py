@@ -0,0 +1,102 @@
+"""Save and load the fully linked topology, VO, project and mappings data,
+so a process can start serving without parsing the YAML data again.
+
+The file starts with a header that says which format, code and topology
+repo commit it was made with; load() ignores files that do not match.
+The contacts data is not saved (it changes independently and is private);
+the loaded data is linked to the contacts data passed to load() instead.
+"""
+import functools
+import hashlib
+import logging
+import os
+import pickle
+from typing import Dict, Optional, Tuple
+
+from webapp.common import write_file_atomically
+from webapp.contacts_reader import ContactsData
+
+
+log = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+DATASETS = ("topology", "vos_data", "projects", "mappings")
+_CONTACTS_ID = "contacts"
+
+
+@functools.lru_cache(maxsize=1)
+def code_version() -> str:
+    """A hash of the code of the classes in the saved data; pickles made by
+    other code versions may not load correctly."""
+    webapp_dir = os.path.dirname(os.path.abspath(__file__))
+    hasher = hashlib.sha1()
+    for name in sorted(os.listdir(webapp_dir)):
+        if name.endswith(".py"):
+            with open(os.path.join(webapp_dir, name), "rb") as fh:
+                hasher.update(name.encode() + b"\0" + fh.read())
+    return hasher.hexdigest()
+
+
+class _Pickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        if isinstance(obj, ContactsData):
+            return _CONTACTS_ID
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+    def __init__(self, file, contacts_data: Optional[ContactsData]):
+        super().__init__(file)
+        self.contacts_data = contacts_data
+
+    def persistent_load(self, pid):
+        if pid == _CONTACTS_ID:
+            return self.contacts_data
+        raise pickle.UnpicklingError("unknown persistent id %r" % pid)
+
+
+def _header(repo_sha: str) -> Dict:
+    return {"format": FORMAT_VERSION, "code": code_version(), "repo": repo_sha}
+
+
+def save(filename: str, repo_sha: str, data: Dict) -> bool:
+    """Write `data` (the DATASETS, loaded from the topology repo at commit
+    `repo_sha`) to `filename`.  See common.write_file_atomically().
+    """
+    def write(fh):
+        pickle.dump(_header(repo_sha), fh, protocol=5)
+        _Pickler(fh, protocol=5).dump({name: data[name] for name in DATASETS})
+
+    try:
+        write_file_atomically(filename, write, prefix=".datasnapshot.")
+    except (OSError, pickle.PicklingError) as e:
+        log.warning("Unable to write data snapshot %s: %s", filename, e)
+        return False
+    log.debug("Wrote data snapshot %s for %s", filename, repo_sha)
+    return True
+
+
+def load(filename: str, repo_sha: Optional[str],
+         contacts_data: Optional[ContactsData]) -> Optional[Tuple[str, Dict]]:
+    """Load the DATASETS from `filename`, linked to `contacts_data`.
+    Returns the topology repo commit they were loaded from and the DATASETS,
+    or None if there is no snapshot for the commit `repo_sha` (any commit if None)
+    made by this version of the code.
+    """
+    try:
+        with open(filename, "rb") as fh:
+            header = pickle.load(fh)
+            expected = _header(repo_sha)
+            if repo_sha is None and isinstance(header, dict):
+                expected["repo"] = header.get("repo")
+            if header != expected:
+                log.info("Ignoring data snapshot %s made for %r", filename, header)
+                return None
+            data = _Unpickler(fh, contacts_data).load()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("Unable to read data snapshot %s: %s", filename, e)
+        return None
+    log.debug("Loaded data snapshot %s for %s", filename, header["repo"])
+    return header["repo"], data
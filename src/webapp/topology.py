@@ -1,17 +1,21 @@
+import bisect
 from collections import OrderedDict, defaultdict
+import copy
 from datetime import datetime, timedelta, timezone
 from enum import Enum
+import functools
 from logging import getLogger
+import re
+import sys
 import urllib.parse
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import icalendar
 
 from .common import RGDOWNTIME_SCHEMA_URL, RGSUMMARY_SCHEMA_URL, Filters, ParsedYaml, \
     is_null, expand_attr_list_single, expand_attr_list, ensure_list, XROOTD_ORIGIN_SERVER, XROOTD_CACHE_SERVER, \
-    gen_id_from_yaml, GRIDTYPE_1, GRIDTYPE_2, is_true, PELICAN_ORIGIN, PELICAN_CACHE
+    gen_id_from_yaml, GRIDTYPE_1, GRIDTYPE_2, is_true, PELICAN_ORIGIN, PELICAN_CACHE, next_serial
 from .contacts_reader import ContactsData, User
-from .exceptions import DataError
 
 log = getLogger(__name__)
 
@@ -25,6 +29,24 @@ class Timeframe(Enum):
 class TopologyError(Exception): pass
 
 
+# Downtime.PREFERRED_TIME_FMT as a regex, e.g. "Mar 7, 2017 03:00 -0500"
+_PREFERRED_TIME_RE = re.compile(r"([A-Za-z]{3}) (\d{1,2}), (\d{4}) (\d{1,2}):(\d\d) ([+-])(\d\d)([0-5]\d)")
+_MONTH_NUMBERS = {name: number for number, name in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], start=1)}
+
+
+def _intern_keys(data):
+    """Intern the keys of the dicts in `data` (in place), since the same keys are in every file"""
+    if isinstance(data, dict):
+        items = [(sys.intern(k) if isinstance(k, str) else k, _intern_keys(v)) for k, v in data.items()]
+        data.clear()
+        data.update(items)
+    elif isinstance(data, list):
+        for item in data:
+            _intern_keys(item)
+    return data
+
+
 class CommonData(object):
     """Global data, e.g. various mappings and contacts info"""
     def __init__(self, contacts: ContactsData, service_types: Dict, support_centers: Dict):
@@ -41,11 +63,14 @@ class CommonData(object):
 
 
 class Facility(object):
+    __slots__ = ["name", "id", "institution_id", "sites_by_name", "_is_ccstar"]
+
     def __init__(self, name: str, id: int, institution_id: str = None):
         self.name = name
         self.id = id
         self.institution_id = institution_id
         self.sites_by_name = dict()
+        self._is_ccstar = None  # type: Optional[bool]
 
     def get_tree(self) -> OrderedDict:
         return OrderedDict([
@@ -57,15 +82,12 @@ class Facility(object):
 
     def add_site(self, site: 'Site'):
         self.sites_by_name[site.name] = site
-        try:
-            del self._is_ccstar
-        except AttributeError:
-            pass
+        self._is_ccstar = None
 
     @property
     def is_ccstar(self):
         """Check if any sites in this facility are tagged CC*"""
-        if not hasattr(self, "_is_ccstar"):
+        if self._is_ccstar is None:
             self._is_ccstar = any(site.is_ccstar for site in self.sites_by_name.values())
 
         return self._is_ccstar
@@ -73,6 +95,8 @@ class Facility(object):
 
 class Site(object):
     # probably will have some other attributes like address, latitude, longitude, etc.
+    __slots__ = ["name", "id", "facility", "resource_groups_by_name", "other_data", "_is_ccstar"]
+
     def __init__(self, name: str, id: int, facility: Facility, site_info):
         self.name = name
         self.id = id
@@ -81,6 +105,7 @@ class Site(object):
         self.other_data = site_info
         if "ID" in self.other_data:
             del self.other_data["ID"]
+        self._is_ccstar = None  # type: Optional[bool]
 
     def get_tree(self) -> OrderedDict:
         # Sort the other_data
@@ -95,22 +120,23 @@ class Site(object):
 
     def add_resource_group(self, resource_group: 'ResourceGroup'):
         self.resource_groups_by_name[resource_group.name] = resource_group
-        try:
-            del self._is_ccstar
-        except AttributeError:
-            pass
+        self._is_ccstar = None
 
     @property
     def is_ccstar(self):
         """Check if any resource groups in this site are tagged CC*"""
-        if not hasattr(self, "_is_ccstar"):
+        if self._is_ccstar is None:
             self._is_ccstar = any(resource_group.is_ccstar for resource_group in self.resource_groups_by_name.values())
 
         return self._is_ccstar
 
 class Resource(object):
+    __slots__ = ["name", "service_types", "common_data", "has_xrootd_cache", "has_xrootd_origin",
+                 "has_pelican_cache", "has_pelican_origin", "service_names", "services", "data", "fqdn", "id",
+                 "rg", "is_ccstar"]
+
     def __init__(self, name: str, yaml_data: ParsedYaml, common_data: CommonData, rg: "ResourceGroup"):
-        self.name = name
+        self.name = sys.intern(name)
         self.service_types = common_data.service_types
         self.common_data = common_data
         # Some "indexes" to speed up data lookup
@@ -142,78 +168,17 @@ class Resource(object):
         self.fqdn = self.data["FQDN"]
         self.id = self.data["ID"]
         self.rg = rg
+        # Tags are repeated across many resources; share a single copy of each
+        # (service and VO names are dict keys, which ResourceGroup interns)
+        if isinstance(self.data.get("Tags"), list):
+            self.data["Tags"] = [sys.intern(tag) if isinstance(tag, str) else tag for tag in self.data["Tags"]]
+        # Check if this resource is tagged CC*
+        self.is_ccstar = "CC*" in self.data.get("Tags", [])
 
     def get_stashcache_files(self, global_data):
         """Gets a resources Cache files as a dictionary"""
-        # TODO Cache this.
-
         import stashcache
-        cache_file_generators_and_file_names = [
-            (
-                lambda resource: stashcache.generate_public_cache_authfile(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False
-                ), "CacheAuthfilePublic"
-            ),
-            (
-                lambda resource: stashcache.generate_cache_authfile(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False
-                ), "CacheAuthfile"
-            ),
-            (
-                lambda resource: stashcache.generate_cache_scitokens(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False
-                ), "CacheScitokens"
-            ),
-        ]
-        origin_file_generators_and_file_names = [
-            (
-                lambda resource: stashcache.generate_origin_authfile(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False,
-                    public_origin=True
-                ), "OriginAuthfilePublic"
-            ),
-            (
-                lambda resource: stashcache.generate_origin_authfile(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False,
-                    public_origin=False
-                ), "OriginAuthfile"
-            ),
-            (
-                lambda resource: stashcache.generate_origin_scitokens(
-                    global_data,
-                    fqdn=resource.fqdn,
-                    suppress_errors=False
-                ), "OriginScitokens"
-            ),
-        ]
-
-        stashcache_files = {}
-        if XROOTD_CACHE_SERVER in self.service_names:
-            for (file_generator, file_name) in cache_file_generators_and_file_names:
-                try:
-                    stashcache_files[file_name] = file_generator(self)
-                except (ValueError, DataError):
-                    continue
-        if XROOTD_ORIGIN_SERVER in self.service_names:
-            for (file_generator, file_name) in origin_file_generators_and_file_names:
-                try:
-                    stashcache_files[file_name] = file_generator(self)
-                except (ValueError, DataError):
-                    continue
-
-        stashcache_files = {k: v for k, v in stashcache_files.items() if v}  # Remove empty dicts
-
-        return stashcache_files
+        return dict(stashcache.get_resource_stashcache_files(global_data, self))
 
     def get_tree(self, authorized=False, filters: Filters = None) -> Optional[OrderedDict]:
         if filters is None:
@@ -253,7 +218,7 @@ class Resource(object):
 
         if filters.voown_name:
             if "VOOwnership" not in self.data \
-                    or set(filters.voown_name).isdisjoint(self.data["VOOwnership"].keys()):
+                    or self.data["VOOwnership"].keys().isdisjoint(filters.voown_name):
                 return
         if "VOOwnership" in self.data:
             new_res["VOOwnership"] = self._expand_voownership(self.data["VOOwnership"])
@@ -284,15 +249,6 @@ class Resource(object):
         """Check if the Resource is active and not disabled"""
         return self.data.get("Active", True) and not self.data.get("Disable", False)
 
-    @property
-    def is_ccstar(self):
-        """Check if this site is tagged as a CC* Site"""
-        if not hasattr(self, "_is_ccstar"):
-            self._is_ccstar = "CC*" in self.data.get("Tags", [])
-
-        return self._is_ccstar
-
-
     def _expand_services(self, services: Dict) -> List[OrderedDict]:
         services_list = expand_attr_list(services, "Name", ordering=["Name", "Description", "Details"])
         for svc in services_list:
@@ -378,9 +334,13 @@ class Resource(object):
 
 
 class ResourceGroup(object):
+    __slots__ = ["name", "site", "service_types", "common_data", "production", "support_center",
+                 "resources_by_name", "resources", "data", "id", "key", "is_ccstar"]
+
     def __init__(self, name: str, yaml_data: ParsedYaml, site: Site, common_data: CommonData):
-        self.name = name
+        self.name = sys.intern(name)
         self.site = site
+        _intern_keys(yaml_data)
         self.service_types = common_data.service_types
         self.common_data = common_data
         self.production = is_true(yaml_data.get("Production", ""))
@@ -399,12 +359,14 @@ class ResourceGroup(object):
             except (AttributeError, KeyError, TypeError, ValueError) as err:
                 log.exception("Error with resource %s: %r", res_name, err)
                 continue
+        # The resources sorted by name
+        self.resources = tuple(self.resources_by_name[k] for k in sorted(self.resources_by_name))
 
         self.data = yaml_data
-
-    @property
-    def resources(self):
-        return [self.resources_by_name[k] for k in sorted(self.resources_by_name)]
+        self.id = gen_id_from_yaml(self.data, self.name, "GroupID")
+        self.key = (self.site.name, self.name)
+        # Check if any resources in this resource group are tagged CC*
+        self.is_ccstar = any(resource.is_ccstar for resource in self.resources)
 
     @property
     def itb(self):
@@ -442,28 +404,12 @@ class ResourceGroup(object):
         filtered_data["Resources"] = {"Resource": filtered_resources}
         return filtered_data
 
-    @property
-    def id(self):
-        return gen_id_from_yaml(self.data, self.name, "GroupID")
-
-    @property
-    def key(self):
-        return (self.site.name, self.name)
-
-    @property
-    def is_ccstar(self):
-        """Check if any resources in this resource group are tagged CC*"""
-        if not hasattr(self, "_is_ccstar"):
-            self._is_ccstar = any(resource.is_ccstar for resource in self.resources_by_name.values())
-
-        return self._is_ccstar
-
     def _expand_rg(self) -> OrderedDict:
         new_rg = OrderedDict.fromkeys(["GridType", "GroupID", "GroupName", "Disable", "Facility", "Site",
                                        "SupportCenter", "GroupDescription", "IsCCStar"])
         new_rg.update({"Disable": False})
         new_rg.update(self.data)
-        new_rg['GroupID'] = gen_id_from_yaml(self.data, self.name, "GroupID")
+        new_rg['GroupID'] = self.id
 
         new_rg["Facility"] = self.site.facility.get_tree()
         new_rg["Site"] = self.site.get_tree()
@@ -482,11 +428,17 @@ class Downtime(object):
     TIME_OUTPUT_FMT = "%b %d, %Y %H:%M %p %Z"
     PREFERRED_TIME_FMT = "%b %d, %Y %H:%M %z"  # preferred format, e.g. "Mar 7, 2017 03:00 -0500"
 
+    __slots__ = ["rg", "data", "start_time", "end_time", "created_time", "res_name", "res", "service_names",
+                 "service_ids", "id", "_ical_event"]
+
     def __init__(self, rg: ResourceGroup, yaml_data: ParsedYaml, common_data: CommonData):
         self.rg = rg
         if not isinstance(yaml_data, dict):
             raise TypeError("yaml data of type %s is not a dictionary" % type(yaml_data))
-        self.data = yaml_data
+        self.data = _intern_keys(yaml_data)
+        for k in ["Class", "Severity"]:
+            if isinstance(yaml_data.get(k), str):
+                yaml_data[k] = sys.intern(yaml_data[k])
         for k in ["StartTime", "EndTime", "ID", "Class", "Severity", "ResourceName", "Services"]:
             if is_null(yaml_data, k):
                 raise ValueError(f"{k} is missing or empty")
@@ -497,9 +449,11 @@ class Downtime(object):
             self.created_time = self.parsetime(yaml_data["CreatedTime"])
         self.res_name = yaml_data["ResourceName"]
         self.res = rg.resources_by_name[self.res_name]
-        self.service_names = yaml_data["Services"]
+        self.res_name = self.res.name
         self.service_ids = [common_data.service_types[x] for x in yaml_data["Services"]]
+        self.service_names = [sys.intern(x) for x in yaml_data["Services"]]
         self.id = yaml_data["ID"]
+        self._ical_event = None  # type: Optional[bytes]
 
     @property
     def timeframe(self) -> Timeframe:
@@ -542,7 +496,7 @@ class Downtime(object):
                 return False
 
         if filters.service_id:
-            if not set(filters.service_id).intersection(set(self.service_ids)):
+            if not any(service_id in filters.service_id for service_id in self.service_ids):
                 return False
 
         return True
@@ -554,7 +508,18 @@ class Downtime(object):
     def get_ical_event(self, filters: Filters = None) -> Optional[icalendar.Event]:
         if not self._is_shown(filters):
             return None
+        return self._make_ical_event()
 
+    def get_ical_event_bytes(self, filters: Filters = None) -> Optional[bytes]:
+        """Like get_ical_event(filters).to_ical(), but the event is only rendered once"""
+        if not self._is_shown(filters):
+            return None
+        if self._ical_event is None:
+            evt = self._make_ical_event()
+            self._ical_event = evt.to_ical() if evt else b""
+        return self._ical_event or None
+
+    def _make_ical_event(self) -> Optional[icalendar.Event]:
         evt = icalendar.Event()
         try:
             evt["uid"] = str(self.data.get("ID", 0))
@@ -625,12 +590,25 @@ class Downtime(object):
         return a_time.strftime(cls.PREFERRED_TIME_FMT)
 
     @classmethod
+    @functools.lru_cache(maxsize=16384)
     def parsetime(cls, time_str: str) -> datetime:
         """Parse the downtime found in the YAML file; tries multiple formats,
-        returns the first one that matches.
+        returns the first one that matches.  The results are cached since
+        the same times show up in many downtimes.
 
         Raises ValueError if time_str cannot be parsed with any of the formats.
         """
+        # Almost all the times are in the preferred format, which is much faster to parse without strptime()
+        match = _PREFERRED_TIME_RE.fullmatch(time_str)
+        if match and match.group(1).lower() in _MONTH_NUMBERS:
+            month, day, year, hour, minute, sign, offset_hours, offset_minutes = match.groups()
+            offset = timedelta(hours=int(offset_hours), minutes=int(offset_minutes))
+            try:
+                time = datetime(int(year), _MONTH_NUMBERS[month.lower()], int(day), int(hour), int(minute),
+                                tzinfo=timezone(-offset if sign == "-" else offset))
+                return time.astimezone(timezone.utc)
+            except ValueError:
+                pass  # out of range; let strptime() handle it
 
         fmts = [cls.PREFERRED_TIME_FMT,
                 "%b %d, %Y %H:%M UTC",  # explicit UTC timezone
@@ -652,17 +630,109 @@ class Downtime(object):
         raise ValueError("Cannot parse time {}".format(time_str))
 
 
-class Topology(object):
-    def __init__(self, common_data: CommonData):
-        self.downtimes_by_timeframe = {
+class DowntimePartition(object):
+    """The downtimes of a DowntimeIndex split by their timeframe at a given time.
+    Stays valid until one of the downtimes starts or ends.
+    """
+    def __init__(self, downtimes: Iterable[Downtime], current_time: datetime):
+        # Identifies this partition; see common.next_serial()
+        self.serial = next_serial()
+        self.created = current_time
+        self.by_timeframe = {
             Timeframe.PAST: [],
             Timeframe.PRESENT: [],
-            Timeframe.FUTURE: []}
+            Timeframe.FUTURE: []}  # type: Dict[Timeframe, List[Downtime]]
+        self.present_by_resource = defaultdict(list)  # type: defaultdict[str, List[Downtime]]
+        # (position, downtime) pairs for each timeframe and RG key, for get()
+        self._by_timeframe_and_rg = {tf: defaultdict(list) for tf in self.by_timeframe}
+        # (position, downtime) pairs of the past downtimes sorted by end time, and their end times, for get()
+        self._past_by_end_time = []  # type: List[Tuple[int, Downtime]]
+        # The earliest time a downtime starts or ends after current_time; None if there is none
+        self.valid_until = None  # type: Optional[datetime]
+        for position, dt in enumerate(downtimes):
+            # same logic as Downtime.timeframe
+            if dt.end_time < current_time:
+                timeframe = Timeframe.PAST
+                changes_at = None
+            elif dt.start_time > current_time:
+                timeframe = Timeframe.FUTURE
+                changes_at = dt.start_time
+            else:
+                timeframe = Timeframe.PRESENT
+                self.present_by_resource[dt.res_name].append(dt)
+                changes_at = dt.end_time
+            self.by_timeframe[timeframe].append(dt)
+            self._by_timeframe_and_rg[timeframe][dt.rg.key].append((position, dt))
+            if changes_at and (self.valid_until is None or changes_at < self.valid_until):
+                self.valid_until = changes_at
+            if timeframe == Timeframe.PAST:
+                self._past_by_end_time.append((position, dt))
+        self._past_by_end_time.sort(key=lambda pair: pair[1].end_time)
+        self._past_end_times = [dt.end_time for _, dt in self._past_by_end_time]  # type: List[datetime]
+
+    def get(self, timeframe: Timeframe, rg_keys: Optional[Set[Tuple[str, str]]] = None,
+            ended_after: Optional[datetime] = None) -> List[Downtime]:
+        """The downtimes in `timeframe`, in the same order as in by_timeframe.  If given, only
+        the downtimes of the RGs in `rg_keys`, and (for past downtimes) the ones that ended
+        at or after `ended_after`.
+        """
+        if timeframe == Timeframe.PAST and ended_after is not None:
+            pairs = self._past_by_end_time[bisect.bisect_left(self._past_end_times, ended_after):]
+            if rg_keys is not None:
+                pairs = [pair for pair in pairs if pair[1].rg.key in rg_keys]
+        elif rg_keys is not None:
+            by_rg = self._by_timeframe_and_rg[timeframe]
+            pairs = [pair for key in rg_keys for pair in by_rg.get(key, ())]
+        else:
+            return self.by_timeframe[timeframe]
+        pairs = sorted(pairs, key=lambda pair: pair[0])
+        return [dt for _, dt in pairs]
+
+    def is_valid(self, current_time: datetime) -> bool:
+        return self.created <= current_time and (self.valid_until is None or current_time < self.valid_until)
+
+
+class DowntimeIndex(object):
+    """The downtimes of a Topology.  Which of them are past, present or future is
+    determined when asked, so it does not go stale between data reloads; the result
+    is cached until the next time a downtime starts or ends.
+    """
+    def __init__(self, downtimes: Iterable[Downtime] = ()):
+        self.downtimes = list(downtimes)  # type: List[Downtime]
+        self._partition = None  # type: Optional[DowntimePartition]
+
+    def __getstate__(self):
+        # The partition's serial is only unique in this process; the unpickled index makes a new one
+        state = self.__dict__.copy()
+        state["_partition"] = None
+        return state
+
+    def add(self, dt: Downtime):
+        self.downtimes.append(dt)
+        self._partition = None
+
+    def partition(self, current_time: Optional[datetime] = None) -> DowntimePartition:
+        """Return the downtimes split by timeframe at current_time (default: now).
+        Downtimes are in the order they were added.
+        """
+        if current_time is None:
+            current_time = datetime.now(timezone.utc)
+        partition = self._partition
+        if partition is None or not partition.is_valid(current_time):
+            partition = DowntimePartition(self.downtimes, current_time)
+            self._partition = partition
+        return partition
+
+
+class Topology(object):
+    def __init__(self, common_data: CommonData):
+        self.downtime_index = DowntimeIndex()
         self.common_data = common_data
         self.facilities = {}
         self.sites = {}
         # rgs are keyed by (site_name, rg_name) tuple
         self.rgs = {}  # type: Dict[Tuple[str, str], ResourceGroup]
+        self.rgs_by_name = {}  # type: Dict[str, ResourceGroup]
         self.resources_by_facility = defaultdict(list)        # type: defaultdict[str, List[Resource]]
         self.resources_by_resource_group = defaultdict(list)  # type: defaultdict[str, List[str]]
         # ^^ should have called it resource_names_by_resource_group, sorry.  -mat
@@ -672,12 +742,93 @@ class Topology(object):
         self.service_names_by_resource = {}  # type: Dict[str, List[str]]
         self.downtime_path_by_resource_group = defaultdict(set)
         self.downtime_path_by_resource = {}
-        self.present_downtimes_by_resource = defaultdict(list)  # type: defaultdict[str, List[Downtime]]
+        # Indexes for filtering RGs: the keys of the RGs that match each value of
+        # these Filters attributes; see get_filtered_rg_keys()
+        self.rg_keys_by_filter = {attr: defaultdict(set) for attr in self.RG_FILTER_ATTRS}
+        # Position of each RG in self.rgs, to sort RGs the same way as before filtering
+        self.rg_positions = {}  # type: Dict[Tuple[str, str], int]
+        self._sorted_rg_keys = None  # type: Optional[List[Tuple[str, str]]]
+        # Changes every time this object is modified; see common.next_serial()
+        self.serial = next_serial()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # The pickled serial came from another process's counter (e.g. from a data snapshot file)
+        self.serial = next_serial()
+
+    # The Filters attributes that get_filtered_rg_keys() uses
+    RG_FILTER_ATTRS = ["facility_id", "site_id", "support_center_id", "rg_id", "service_id", "voown_name",
+                       "grid_type"]
+    # The ones that filter downtimes the same way (by the RG of the downtime)
+    DOWNTIME_FILTER_ATTRS = ["facility_id", "site_id", "support_center_id", "rg_id"]
+
+    @staticmethod
+    def _rg_filter_values(rg: "ResourceGroup") -> Iterator[Tuple[str, object]]:
+        """The (Filters attribute, value) pairs that ResourceGroup.get_tree() may return the RG for"""
+        yield "facility_id", rg.site.facility.id
+        yield "site_id", rg.site.id
+        yield "support_center_id", rg.support_center["ID"]
+        yield "rg_id", rg.id
+        yield "grid_type", GRIDTYPE_1 if rg.production else GRIDTYPE_2
+        for res in rg.resources_by_name.values():
+            for svc in res.services:
+                yield "service_id", svc["ID"]
+            voownership = res.data.get("VOOwnership")
+            if isinstance(voownership, dict):
+                for vo_name in voownership:
+                    yield "voown_name", vo_name
+
+    def _index_rg(self, key: Tuple[str, str], filter_values: Iterable[Tuple[str, object]], add=True):
+        for attr, value in filter_values:
+            keys = self.rg_keys_by_filter[attr][value]
+            if add:
+                keys.add(key)
+            else:
+                keys.discard(key)
+
+    def get_filtered_rg_keys(self, filters: Filters, attrs: List[str] = None) -> Optional[Set[Tuple[str, str]]]:
+        """
+        Return the keys of the RGs that can match the `attrs` (default: RG_FILTER_ATTRS)
+        filters in `filters`, or None if none of those filters are set.
+        The RGs still need to be filtered with get_tree(); this just skips the ones that can't match.
+        """
+        candidates = None
+        for attr in attrs or self.RG_FILTER_ATTRS:
+            values = getattr(filters, attr)
+            if values is None or (attr != "grid_type" and not values):
+                continue
+            if attr == "grid_type":
+                values = [values]
+            index = self.rg_keys_by_filter[attr]
+            matching = set()
+            for value in values:
+                matching.update(index.get(value, ()))
+            candidates = matching if candidates is None else candidates & matching
+        return candidates
+
+    def sorted_rg_keys(self, rg_keys: Iterable[Tuple[str, str]] = None) -> List[Tuple[str, str]]:
+        """The keys in `rg_keys` (default: all RGs) sorted by RG name (case-insensitive),
+        then the order the RGs were added in."""
+        if rg_keys is None:
+            if self._sorted_rg_keys is None:
+                self._sorted_rg_keys = sorted(self.rgs.keys(), key=lambda x: x[1].lower())
+            return self._sorted_rg_keys
+        return sorted(rg_keys, key=lambda x: (x[1].lower(), self.rg_positions[x]))
 
     def add_rg(self, facility_name: str, site_name: str, name: str, parsed_data: ParsedYaml):
+        self.serial = next_serial()
         try:
             rg = ResourceGroup(name, parsed_data, self.sites[site_name], self.common_data)
-            self.rgs[(site_name, name)] = rg
+            filter_values = list(self._rg_filter_values(rg))
+            key = (site_name, name)
+            if key in self.rgs:
+                self._index_rg(key, self._rg_filter_values(self.rgs[key]), add=False)
+            else:
+                self.rg_positions[key] = len(self.rg_positions)
+            self.rgs[key] = rg
+            self.rgs_by_name[rg.name] = rg
+            self._sorted_rg_keys = None
+            self._index_rg(key, filter_values)
             self.resource_group_by_site[site_name].add(rg.name)
             self.sites[site_name].add_resource_group(rg)
             for r in rg.resources:
@@ -691,13 +842,24 @@ class Topology(object):
             log.exception("RG %s, %s error: %r; skipping", site_name, name, err)
 
     def add_facility(self, name, id, institution_id=None):
+        self.serial = next_serial()
         self.facilities[name] = Facility(name, id, institution_id)
 
     def add_site(self, facility_name, name, id, site_info):
+        self.serial = next_serial()
         site = Site(name, id, self.facilities[facility_name], site_info)
         self.facilities[facility_name].add_site(site)
         self.sites[name] = site
 
+    @property
+    def downtimes_by_timeframe(self) -> Dict[Timeframe, List[Downtime]]:
+        """The downtimes split by whether they are past, present or future right now."""
+        return self.downtime_index.partition().by_timeframe
+
+    def get_present_downtimes(self, resource_name: str) -> List[Downtime]:
+        """Return the downtimes of a resource that are in effect right now."""
+        return self.downtime_index.partition().present_by_resource.get(resource_name, [])
+
     def get_resource_group_list(self):
         """
         Simple getter for an iterator of resource group objects associated with this topology.
@@ -708,7 +870,7 @@ class Topology(object):
         if filters is None:
             filters = Filters()
         rglist = []
-        for rgkey in sorted(self.rgs.keys(), key=lambda x: x[1].lower()):
+        for rgkey in self.sorted_rg_keys(self.get_filtered_rg_keys(filters)):
             rgval = self.rgs[rgkey]
             assert isinstance(rgval, ResourceGroup)
             rgtree = rgval.get_tree(authorized, filters)
@@ -731,7 +893,7 @@ class Topology(object):
                                ("CurrentDowntimes", Timeframe.PRESENT),
                                ("FutureDowntimes", Timeframe.FUTURE)]:
             dtlist = []
-            for dt in self.downtimes_by_timeframe[dtkey]:
+            for dt in self._get_filtered_downtimes(dtkey, filters):
                 try:
                     dttree = dt.get_tree(filters)
                 except (AttributeError, KeyError, ValueError) as err:
@@ -744,7 +906,23 @@ class Topology(object):
 
         return tree
 
-    def get_downtimes_ical(self, authorized=False, filters: Filters = None) -> icalendar.Calendar:
+    def _get_filtered_downtimes(self, timeframe: Timeframe, filters: Filters) -> List[Downtime]:
+        """The downtimes in `timeframe` that can match `filters` (they still need to be checked)"""
+        ended_after = None
+        if timeframe == Timeframe.PAST and filters.past_days >= 0:
+            # Downtime._is_shown() leaves out the ones that ended more than past_days ago
+            try:
+                ended_after = datetime.now(timezone.utc) - timedelta(days=filters.past_days)
+            except OverflowError:
+                pass
+        rg_keys = self.get_filtered_rg_keys(filters, self.DOWNTIME_FILTER_ATTRS)
+        return self.downtime_index.partition().get(timeframe, rg_keys, ended_after)
+
+    def get_downtimes_ical(self, authorized=False, filters: Filters = None) -> bytes:
+        """Return the downtimes as an iCalendar file.  The events are rendered once per
+        downtime and reused, so this is the same as building an icalendar.Calendar
+        of Downtime.get_ical_event() events and calling to_ical(), only faster.
+        """
         _ = authorized
         if filters is None:
             filters = Filters()
@@ -752,18 +930,22 @@ class Topology(object):
         cal = icalendar.Calendar()
         cal.add("prodid", "-//Open Science Grid//Topology//EN")
         cal.add("version", "2.0")
+        footer = b"END:VCALENDAR\r\n"
+        header = cal.to_ical()[:-len(footer)]
 
+        events = [header]
         for tf in [Timeframe.PAST, Timeframe.PRESENT, Timeframe.FUTURE]:
-            for dt in self.downtimes_by_timeframe[tf]:
+            for dt in self._get_filtered_downtimes(tf, filters):
                 try:
-                    event = dt.get_ical_event(filters)
+                    event = dt.get_ical_event_bytes(filters)
                 except (AttributeError, KeyError, ValueError) as err:
                     log.exception("Error with downtime %s: %r", dt, err)
                     continue
                 if event:
-                    cal.add_component(event)
+                    events.append(event)
+        events.append(footer)
 
-        return cal
+        return b"".join(events)
 
     def add_downtime(self, sitename: str, rgname: str, downtime: ParsedYaml):
         try:
@@ -788,9 +970,31 @@ class Topology(object):
         except TypeError as err:
             log.warning("Invalid type in downtime(s) -- skipping: %r", err)
             return
-        self.downtimes_by_timeframe[dt.timeframe].append(dt)
-        if dt.timeframe == Timeframe.PRESENT:
-            self.present_downtimes_by_resource[dt.res_name].append(dt)
+        self._add_downtime_obj(dt)
+
+    def _add_downtime_obj(self, dt: Downtime):
+        self.serial = next_serial()
+        self.downtime_index.add(dt)
+
+    def copy_without_downtimes(self, rg_keys: Iterable[Tuple[str, str]]) -> "Topology":
+        """Return a shallow copy of this Topology that shares the facility/site/RG/resource
+        objects but not the downtimes of the RGs in `rg_keys` (a list of (site_name, rg_name)
+        tuples), so those can be reloaded with add_downtime().
+        """
+        rg_keys = set(rg_keys)
+        new_topology = copy.copy(self)
+        new_topology.serial = next_serial()
+        new_topology.downtime_index = DowntimeIndex(dt for dt in self.downtime_index.downtimes
+                                                    if dt.rg.key not in rg_keys)
+        return new_topology
+
+    def sort_downtimes(self):
+        """Put the downtimes in the order get_topology() adds them in: grouped by RG in the
+        order the RGs were added, and in the order they were added within each RG.
+        """
+        self.serial = next_serial()
+        self.downtime_index = DowntimeIndex(sorted(self.downtime_index.downtimes,
+                                                   key=lambda dt: self.rg_positions[dt.rg.key]))
 
     def safe_get_resource_by_fqdn(self, fqdn: str) -> Optional[Resource]:
         """Returns the first resource that has the given FQDN or None if no such resource exists."""
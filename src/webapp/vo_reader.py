@@ -11,7 +11,7 @@ import yaml
 if __name__ == "__main__" and __package__ is None:
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from webapp.common import load_yaml_file, to_xml, ParsedYaml
+from webapp.common import load_yaml_file, preload_yaml_files, to_xml, ParsedYaml
 from webapp.contacts_reader import get_contacts_data
 from webapp.vos_data import VOsData
 
@@ -20,6 +20,7 @@ log = logging.getLogger(__name__)
 
 
 def get_vos_data(indir, contacts_data, strict=False) -> VOsData:
+    preload_yaml_files(os.path.join(indir, file) for file in os.listdir(indir) if file.endswith(".yaml"))
     reporting_groups_data = load_yaml_file(os.path.join(indir, "REPORTING_GROUPS.yaml"))
     vos_data = VOsData(contacts_data=contacts_data, reporting_groups_data=reporting_groups_data)
     for file in os.listdir(indir):
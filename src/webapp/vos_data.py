@@ -4,7 +4,8 @@ from collections import OrderedDict
 from logging import getLogger
 from typing import Dict, List, Optional
 
-from .common import Filters, ParsedYaml, VOSUMMARY_SCHEMA_URL, is_null, expand_attr_list, order_dict, escape, gen_id_from_yaml
+from .common import Filters, ParsedYaml, VOSUMMARY_SCHEMA_URL, is_null, expand_attr_list, order_dict, escape, gen_id_from_yaml, \
+    next_serial
 from .data_federation import StashCache
 from .contacts_reader import ContactsData
 
@@ -18,11 +19,19 @@ class VOsData(object):
         self.vos = {}  # type: Dict[str, ParsedYaml]
         self.reporting_groups_data = reporting_groups_data
         self.stashcache_by_vo_name = {}  # type: Dict[str, StashCache]
+        # Changes every time this object is modified; see common.next_serial()
+        self.serial = next_serial()
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # The pickled serial came from another process's counter (e.g. from a data snapshot file)
+        self.serial = next_serial()
 
     def get_vo_id_to_name(self) -> Dict[str, str]:
         return {self.vos[name]["ID"]: name for name in self.vos}
 
     def add_vo(self, vo_name: str, vo_data: ParsedYaml):
+        self.serial = next_serial()
         vo_data["ID"] = gen_id_from_yaml(vo_data, vo_name)
         self.vos[vo_name] = vo_data
         stashcache_data = vo_data.get('DataFederations', {}).get('StashCache')